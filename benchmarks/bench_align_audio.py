@@ -0,0 +1,124 @@
+# Accuracy and speed of the FFT audio alignment against a brute-force lag search
+#
+#   python benchmarks/bench_align_audio.py [note_count]
+#
+# Renders synthetic piano audio (decaying partials per note, plus noise) from a note table, shifted by
+# known lead-ins, and recovers the shift from the onset envelope, whose peak memory is reported too. Runs
+# a random rhythm and steady eighth notes, where every beat is a candidate offset. Exits with status 1 when
+# an offset is off by more than one envelope step or a match scores below ALIGN_MIN_SCORE, or audio of other
+# notes in the same rhythm does not.
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import fake_bpy  # noqa: F401, puts the repository on sys.path and bpy in sys.modules
+from piano_animation import piano_core
+
+SAMPLE_RATE = piano_core.ALIGN_SAMPLE_RATE
+NOTE_SECONDS = 0.6
+LEAD_INS = (0.0, 0.35, 2.0, 7.77, -1.25)  # Negative: the recording starts inside the first notes
+
+
+def melody(count, seed=0):
+    rng = np.random.default_rng(seed)
+    table = np.zeros(count, dtype=piano_core.NOTE_DTYPE)
+    table["note"] = rng.integers(40, 90, count)
+    table["start"] = np.cumsum(rng.choice((0.0, 0.125, 0.25, 0.5), count, p=(0.2, 0.3, 0.3, 0.2))) + 1.5
+    table["end"] = table["start"] + 0.3
+    table["velocity"] = rng.integers(40, 120, count)
+    return table
+
+
+def render(notes, lead_in, seed=1):
+    rng = np.random.default_rng(seed)
+    length = int((notes["end"].max() + NOTE_SECONDS + max(lead_in, 0.0)) * SAMPLE_RATE)
+    audio = np.zeros(length, dtype=np.float32)
+    t = np.arange(int(NOTE_SECONDS * SAMPLE_RATE)) / SAMPLE_RATE
+    for note, start, velocity in zip(notes["note"], notes["start"], notes["velocity"]):
+        first = int(round((start + lead_in) * SAMPLE_RATE))
+        if first < 0:
+            continue
+        frequency = 440.0 * 2 ** ((int(note) - 69) / 12)
+        tone = sum(np.sin(2 * np.pi * frequency * k * t) / k for k in (1, 2, 3) if frequency * k < SAMPLE_RATE / 2)
+        tone = (velocity / 127.0) * tone * np.exp(-t * 6.0)
+        last = min(length, first + len(tone))
+        audio[first:last] += tone[:last - first].astype(np.float32)
+    return audio + rng.normal(0.0, 0.05, length).astype(np.float32)
+
+
+def brute_force_offset(envelope, onsets, rate, max_offset):
+    envelope = envelope - envelope.mean()
+    onsets = onsets - onsets.mean()
+    best_lag, best_value = 0, -np.inf
+    max_lag = int(max_offset * rate)
+    for lag in range(-min(max_lag, len(onsets) - 1), min(max_lag, len(envelope) - 1) + 1):
+        if lag >= 0:
+            value = np.dot(envelope[lag:lag + len(onsets)], onsets[:len(envelope) - lag])
+        else:
+            value = np.dot(envelope[:len(onsets) + lag], onsets[-lag:-lag + len(envelope)])
+        if value > best_value:
+            best_lag, best_value = lag, value
+    return best_lag / rate
+
+
+def steady(count, seed=0, step=0.125):
+    # Eighth notes at 120 bpm, the case where every beat gives a correlation peak
+    table = melody(count, seed)
+    table["start"] = np.arange(count) * step + 1.5
+    table["end"] = table["start"] + 0.3
+    return table
+
+
+def check(label, make_notes, count):
+    notes = make_notes(count)
+    onsets = piano_core.get_note_onset_train(notes)
+    rate = piano_core.ALIGN_ENVELOPE_RATE
+    ok = True
+    print(f"  {label}: {count} notes, {notes['end'].max():.0f} s of audio at {SAMPLE_RATE} Hz")
+    for lead_in in LEAD_INS:
+        audio = render(notes, lead_in)
+
+        start = time.perf_counter()
+        envelope = piano_core.get_onset_envelope(audio, SAMPLE_RATE)
+        envelope_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        offset, score = piano_core.find_audio_offset(envelope, onsets)
+        fft_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        brute_offset = brute_force_offset(envelope, onsets, rate, piano_core.ALIGN_MAX_OFFSET)
+        brute_time = time.perf_counter() - start
+
+        match = abs(offset - lead_in) <= 1.0 / rate and score >= piano_core.ALIGN_MIN_SCORE and abs(offset - brute_offset) < 0.5 / rate
+        ok &= match
+        print(f"    lead-in {lead_in:6.2f} s  found {offset:6.2f} s  score {score:5.1f}  envelope {envelope_time * 1000:7.1f} ms  "
+              f"FFT {fft_time * 1000:6.1f} ms  brute force {brute_time * 1000:8.1f} ms  {'ok' if match else 'MISMATCH'}")
+
+    # The spectrogram is computed in blocks, so the peak stays flat as the audio gets longer
+    tracemalloc.start()
+    piano_core.get_onset_envelope(audio, SAMPLE_RATE)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"    envelope peak memory {peak / 1e6:.1f} MB for {audio.nbytes / 1e6:.1f} MB of audio")
+
+    # Audio of other notes in the same rhythm should not pass as a match
+    _, score = piano_core.find_audio_offset(piano_core.get_onset_envelope(render(make_notes(count, seed=7), 0.0), SAMPLE_RATE), onsets)
+    unrelated = score < piano_core.ALIGN_MIN_SCORE
+    ok &= unrelated
+    print(f"    unrelated audio score {score:5.1f}  {'rejected' if unrelated else 'ACCEPTED'}")
+    return ok
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    ok = check("random rhythm", melody, count)
+    ok &= check("steady eighths", steady, count)
+    ok &= check("steady eighths", steady, 200)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
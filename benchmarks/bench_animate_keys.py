@@ -0,0 +1,72 @@
+# Regression benchmark: keyframe work in animate_keys must grow linearly with the number of notes
+#
+#   python benchmarks/bench_animate_keys.py
+#
+# Exits with status 1 when the work per note grows with the note count.
+import sys
+import time
+
+import numpy as np
+
+import fake_bpy
+from piano_animation import piano_blender, piano_core
+
+SIZES = (1000, 2000, 4000, 8000, 16000)
+MAX_GROWTH = 1.5  # Allowed ratio between the largest and smallest work per note
+
+
+def trill(count, notes=(60, 62)):
+    # Worst case for per-key work: every note lands on one of two keys
+    return [(notes[i % len(notes)], i * 0.15, i * 0.15 + 0.25) for i in range(count)]
+
+
+def chords(count):
+    # Spread case: four-note chords walking up and down the keyboard
+    result = []
+    for i in range(count):
+        root = 36 + (i // 4) % 48
+        start = (i // 4) * 0.5
+        result.append((root + (0, 4, 7, 12)[i % 4], start, start + 0.4))
+    return result
+
+
+def legacy_interpolation_writes(notes):
+    # What the old per-note re-pass cost: all 4k points of 3 location F-curves after each of the k presses
+    presses = {}
+    for note, _, _ in notes:
+        presses[note] = presses.get(note, 0) + 1
+    return sum(6 * k * (k + 1) for k in presses.values())
+
+
+def run(notes):
+    fake_bpy.reset_data()
+    fake_bpy.add_keyboard()
+    table = np.array([note + (64, 0) for note in notes], dtype=piano_core.NOTE_DTYPE)
+    start = time.perf_counter()
+    piano_blender.animate_keys(table)
+    elapsed = time.perf_counter() - start
+    work = fake_bpy.stats.rna_calls + fake_bpy.stats.values_written
+    return elapsed, work
+
+
+def main():
+    failed = False
+    for name, generator in (("trill", trill), ("chords", chords)):
+        print(f"{name}:")
+        per_note = []
+        for size in SIZES:
+            notes = generator(size)
+            elapsed, work = run(notes)
+            per_note.append(work / size)
+            print(f"  {size:>6} notes  {elapsed * 1000:8.1f} ms  work {work:>9}  "
+                  f"work/note {work / size:6.2f}  legacy re-pass writes {legacy_interpolation_writes(notes):>12}")
+        growth = max(per_note) / min(per_note)
+        print(f"  work/note growth {growth:.2f}")
+        if growth > MAX_GROWTH:
+            print(f"  FAIL: work per note grew more than {MAX_GROWTH}x")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
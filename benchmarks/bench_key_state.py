@@ -0,0 +1,90 @@
+# Scrub latency and memory of the keyframe-free frame handler backend against keyframes
+#
+#   python benchmarks/bench_key_state.py [note_count...]
+#
+# Scrubbing jumps to random frames. The keyframe path is measured as what Blender does per frame: a
+# binary search in every key's keyframes (np.interp stands in for F-curve evaluation) and a height
+# write per key. The key state path runs KeyStatePlayer.apply, which the frame_change_pre handler calls.
+# Keyframe memory is estimated from the size of Blender's BezTriple; the key state is its array size.
+import os
+import sys
+import time
+
+import numpy as np
+
+import fake_bpy
+from piano_animation import piano_blender, piano_core
+
+BEZTRIPLE_BYTES = 72  # sizeof(BezTriple), one per keyframe point
+SCRUB_FRAMES = 2000
+
+
+def chords(count):
+    table = np.zeros(count, dtype=piano_core.NOTE_DTYPE)
+    index = np.arange(count)
+    table["note"] = 36 + (index // 4) % 48 + np.array((0, 4, 7, 12))[index % 4]
+    table["start"] = (index // 4) * 0.5
+    table["end"] = table["start"] + 0.4
+    table["velocity"] = 64
+    return table
+
+
+def keyframe_curves(key_index):
+    curves = []
+    for key_object in key_index.keys.values():
+        fcurve = piano_blender.find_location_z_fcurve(key_object)
+        if fcurve is not None:
+            co = np.array(fcurve.keyframe_points.co, dtype=np.float64)
+            curves.append((key_object, co[:, 0], co[:, 1]))
+    return curves
+
+
+def scrub_keyframes(curves, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        for key_object, key_frames, values in curves:
+            key_object.location.z = float(np.interp(frame, key_frames, values))
+    return (time.perf_counter() - start) / len(frames)
+
+
+def scrub_key_state(player, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        player.apply(frame)
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000]
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        notes = chords(size)
+
+        fake_bpy.reset_data()
+        fake_bpy.add_keyboard()
+        key_index = piano_blender.KeyIndex()
+        keyframes = piano_blender.animate_keys(notes, key_index)["keyframes_written"]
+        curves = keyframe_curves(key_index)
+
+        fake_bpy.reset_data()
+        fake_bpy.add_keyboard()
+        scene = fake_bpy.bpy.context.scene
+        stats = piano_blender.use_key_state(scene, notes)
+        player = piano_blender.KeyStatePlayer(scene)
+        frame_count = stats["key_state_frames"]
+
+        frames = rng.integers(0, frame_count, SCRUB_FRAMES).tolist()
+        keyframe_latency = scrub_keyframes(curves, frames)
+        key_state_latency = scrub_key_state(player, frames)
+
+        print(f"  {size:>8} notes  {frame_count:>8} frames")
+        print(f"    keyframes   {keyframes:>9} points  ~{keyframes * BEZTRIPLE_BYTES / 1e6:8.2f} MB  "
+              f"scrub {keyframe_latency * 1e6:8.1f} us/frame")
+        print(f"    key state   {player.state.size:>9} cells  {player.state.nbytes / 1e6:9.2f} MB  "
+              f"scrub {key_state_latency * 1e6:8.1f} us/frame  (sidecar {os.path.getsize(stats['key_state_path']) / 1e6:.2f} MB)")
+        os.remove(stats["key_state_path"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# Keyframe throughput of the modal operator's chunked path against animate_keys, plus a rollback check
+#
+#   python benchmarks/bench_modal_chunks.py [note_count]
+#
+# Drives iter_animate_keys in time-budgeted chunks like PianoAnimationModalOperator.modal does, then
+# again with snapshots on and restores them. Exits with status 1 when the chunked path is much slower
+# than animate_keys or the rollback does not bring back the keyframes, animation data and actions of the
+# previous run. Snapshot time is reported on its own: foreach_get is a Python loop in the stand-in but a
+# copy in Blender.
+import sys
+import time
+
+import numpy as np
+
+import fake_bpy
+from piano_animation import piano_blender, piano_core
+
+TIME_BUDGET = 0.005  # Seconds per simulated timer event, small so the run is split into many chunks
+MAX_SLOWDOWN = 1.5
+
+
+def chords(count, shift=0.0):
+    table = np.zeros(count, dtype=piano_core.NOTE_DTYPE)
+    index = np.arange(count)
+    table["note"] = 36 + (index // 4) % 48 + np.array((0, 4, 7, 12))[index % 4]
+    table["start"] = (index // 4) * 0.5 + shift
+    table["end"] = table["start"] + 0.4
+    table["velocity"] = 64
+    return table
+
+
+def keyframes_of(key_index):
+    return {
+        note: list(key_object.animation_data.action.fcurves.find("location", index=2).keyframe_points.co)
+        for note, key_object in key_index.keys.items()
+        if key_object.animation_data and key_object.animation_data.action
+    }
+
+
+def animation_data_of(key_index):
+    return {note for note, key_object in key_index.keys.items() if key_object.animation_data is not None}
+
+
+def low_notes():
+    table = chords(8)
+    table["note"] -= 15
+    return table
+
+
+def run_chunked(notes, key_index, snapshots):
+    stats = {}
+    steps = piano_blender.iter_animate_keys(notes, stats, key_index, snapshots=snapshots)
+    chunks = 0
+    done = False
+    while not done:
+        done = True
+        chunks += 1
+        deadline = time.perf_counter() + TIME_BUDGET
+        for _ in steps:
+            if time.perf_counter() >= deadline:
+                done = False
+                break
+    return stats, chunks
+
+
+def animated_keyboard(notes):
+    fake_bpy.reset_data()
+    fake_bpy.add_keyboard()
+    key_index = piano_blender.KeyIndex()
+    piano_blender.animate_keys(notes, key_index)
+    return key_index
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    first, second = chords(count), chords(count, shift=0.25)
+
+    key_index = animated_keyboard(first)
+    start = time.perf_counter()
+    blocking_stats = piano_blender.animate_keys(second, key_index)
+    blocking_time = time.perf_counter() - start
+
+    key_index = animated_keyboard(first)
+    start = time.perf_counter()
+    chunked_stats, chunks = run_chunked(second, key_index, None)
+    chunked_time = time.perf_counter() - start
+
+    # The rolled back run also keys the lowest keys, which had no animation data before
+    key_index = animated_keyboard(first)
+    before = keyframes_of(key_index), animation_data_of(key_index), len(fake_bpy.bpy.data.actions)
+    snapshots = []
+    start = time.perf_counter()
+    run_chunked(np.concatenate((second, low_notes())), key_index, snapshots)
+    snapshot_time = time.perf_counter() - start
+    for snapshot in reversed(snapshots):
+        piano_blender.restore_key(snapshot)
+    restored = (keyframes_of(key_index), animation_data_of(key_index), len(fake_bpy.bpy.data.actions)) == before
+
+    keyframes = blocking_stats["keyframes_written"]
+    print(f"  {count} notes, {keyframes} keyframes")
+    print(f"  animate_keys        {blocking_time * 1000:8.1f} ms  {keyframes / blocking_time:12.0f} keyframes/s")
+    print(f"  chunked             {chunked_time * 1000:8.1f} ms  {chunked_stats['keyframes_written'] / chunked_time:12.0f} keyframes/s"
+          f"  {chunks} chunks")
+    print(f"  chunked, snapshots  {snapshot_time * 1000:8.1f} ms  {len(snapshots)} keys snapshotted, rollback "
+          f"{'restored' if restored else 'MISMATCH'}")
+
+    slowdown = chunked_time / blocking_time
+    if slowdown > MAX_SLOWDOWN:
+        print(f"  FAIL: chunked path is {slowdown:.2f}x slower")
+        return 1
+    return 0 if restored and chunked_stats == blocking_stats else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# Micro-benchmark of note on/off pairing on pathological inputs
+#
+#   python benchmarks/bench_note_pairing.py [note_count]
+#
+# Compares the old list.pop(0) pairing with NotePairer for every pairing policy.
+import sys
+import time
+import tracemalloc
+
+import fake_bpy  # noqa: F401, puts the repository on sys.path and bpy in sys.modules
+from piano_animation import piano_core
+
+
+def legacy_pairing(events):
+    # parse_midi's pairing before NotePairer: a dict per open note in a per-pitch list closed with pop(0)
+    notes = []
+    note_times = {}
+    for time_, note, velocity, channel in events:
+        if velocity > 0:
+            if note not in note_times:
+                note_times[note] = []
+            note_times[note].append({'start': time_, 'velocity': velocity, 'channel': channel})
+        elif note in note_times and note_times[note]:
+            note_info = note_times[note].pop(0)
+            notes.append((note, note_info['start'], time_, note_info['velocity'], note_info['channel']))
+    return notes
+
+
+def pairer_pairing(policy):
+    def pair(events):
+        pairer = piano_core.NotePairer(policy)
+        for time_, note, velocity, channel in events:
+            if velocity > 0:
+                pairer.note_on(time_, note, velocity, channel)
+            else:
+                pairer.note_off(time_, note)
+        return pairer.notes
+    return pair
+
+
+def stacked(count):
+    # Every note on of one pitch arrives before the first note off
+    ons = [(i * 0.001, 60, 100, 0) for i in range(count)]
+    offs = [(count * 0.001 + i * 0.001, 60, 0, 0) for i in range(count)]
+    return ons + offs
+
+
+def sustained_clusters(count):
+    # Sustain-pedal style clusters over the whole keyboard, released in large batches
+    events = []
+    depth = 64
+    for block in range(count // (88 * depth) + 1):
+        base = block * 10.0
+        for layer in range(depth):
+            for note in range(21, 109):
+                events.append((base + layer * 0.01, note, 90, 0))
+        for layer in range(depth):
+            for note in range(21, 109):
+                events.append((base + 5.0 + layer * 0.01, note, 0, 0))
+    return events[:2 * count]
+
+
+def retriggered(count):
+    # Repeated note ons of a few pitches with note offs arriving late
+    events = []
+    for i in range(count):
+        events.append((i * 0.01, 60 + i % 3, 80, 0))
+        if i >= 500:
+            events.append((i * 0.01 + 0.005, 60 + (i - 500) % 3, 0, 0))
+    return events
+
+
+def measure(pair, events):
+    tracemalloc.start()
+    start = time.perf_counter()
+    notes = pair(events)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, len(notes)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    pairers = [("legacy pop(0)", legacy_pairing)]
+    pairers += [(f"NotePairer {policy}", pairer_pairing(policy)) for policy, _, _ in piano_core.PAIRING_POLICIES]
+    for name, generator in (("stacked", stacked), ("sustained_clusters", sustained_clusters), ("retriggered", retriggered)):
+        events = generator(count)
+        print(f"{name} ({len(events)} events):")
+        for label, pair in pairers:
+            elapsed, peak, paired = measure(pair, events)
+            print(f"  {label:<22} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:7.2f} MB  {paired:>8} notes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# Compares the memoryview SMF parser with the mido based parse_midi on synthetic files
+#
+#   python benchmarks/bench_parse_midi.py [note_count] [midi files...]
+#
+# Exits with status 1 when the two parsers disagree on any file.
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import fake_bpy  # noqa: F401, puts the repository on sys.path and bpy in sys.modules
+import midi_gen
+from piano_animation import piano_core
+
+TOLERANCE = 1e-6  # Seconds; mido accumulates float deltas, the fast parser converts from ticks
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def same_notes(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    return (
+        np.array_equal(expected["note"], actual["note"])
+        and np.array_equal(expected["velocity"], actual["velocity"])
+        and np.array_equal(expected["channel"], actual["channel"])
+        and np.allclose(expected["start"], actual["start"], rtol=0, atol=TOLERANCE)
+        and np.allclose(expected["end"], actual["end"], rtol=0, atol=TOLERANCE)
+    )
+
+
+def compare(name, path):
+    expected, mido_time = timed(piano_core.parse_midi, path)
+    actual, fast_time = timed(piano_core.parse_midi_fast, path)
+    match = same_notes(expected, actual)
+    print(f"  {name:<16} {len(expected):>8} notes  mido {mido_time * 1000:9.1f} ms  "
+          f"fast {fast_time * 1000:8.1f} ms  speedup {mido_time / max(fast_time, 1e-9):5.1f}x  "
+          f"{'match' if match else 'MISMATCH'}")
+    return match
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generator in midi_gen.GENERATORS.items():
+            path = os.path.join(directory, f"{name}.mid")
+            midi_gen.write_smf(path, generator(count))
+            ok &= compare(name, path)
+    for path in sys.argv[2:]:
+        ok &= compare(os.path.basename(path), path)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# Per-track parsing for multi-piano runs: one worker, a thread pool and a process pool against parse_midi_fast
+#
+#   python benchmarks/bench_parse_parts.py [note_count] [track_count]
+#
+# Exits with status 1 when the per-track tables do not hold the same notes as parse_midi_fast.
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import fake_bpy  # noqa: F401, puts the repository on sys.path and bpy in sys.modules
+import midi_gen
+from piano_animation import piano_core
+
+
+def sorted_notes(table):
+    return np.sort(table, order=["start", "note", "end"])
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    tracks = int(sys.argv[2]) if len(sys.argv) > 2 else 8  # multi_track gives every track its own channel and register, up to 12
+    workers = min(tracks, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "multi_track.mid")
+        midi_gen.write_smf(path, midi_gen.multi_track(count, tracks))
+
+        start = time.perf_counter()
+        expected = piano_core.parse_midi_fast(path)
+        print(f"  parse_midi_fast          {(time.perf_counter() - start) * 1000:9.1f} ms  {len(expected)} notes")
+
+        ok = True
+        executors = (
+            ("1 thread", lambda: ThreadPoolExecutor(max_workers=1)),
+            (f"{workers} threads", lambda: ThreadPoolExecutor(max_workers=workers)),
+            (f"{workers} processes", lambda: ProcessPoolExecutor(max_workers=workers)),
+        )
+        for label, make_executor in executors:
+            with make_executor() as executor:
+                start = time.perf_counter()
+                parts = piano_core.parse_midi_parts(path, 'TRACK', executor=executor)
+                elapsed = time.perf_counter() - start
+            actual = piano_core.join_note_tables(parts)
+            match = len(actual) == len(expected) and np.allclose(
+                sorted_notes(actual)["end"], sorted_notes(expected)["end"], rtol=0, atol=1e-9)
+            ok &= match
+            print(f"  parse_midi_parts {label:<12} {elapsed * 1000:9.1f} ms  {len(parts)} tables  "
+                  f"{'match' if match else 'MISMATCH'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
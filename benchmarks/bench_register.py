@@ -0,0 +1,76 @@
+# Startup cost of the add-on: importing and registering piano_animation, against loading the pipeline too
+#
+#   python benchmarks/bench_register.py [runs]
+#
+# Every measurement runs in a fresh interpreter so imports are cold. "register" is what Blender pays at
+# startup with the add-on enabled; "register + pipeline" adds the piano_core, piano_blender, numpy and mido
+# imports that now wait for the first operator run. Class registration itself is a no-op in the bpy
+# stand-in, so this measures the Python side only. Exits with status 1 when registering loads numpy,
+# mido or the pipeline modules, or when registering twice leaves duplicate frame handlers.
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules that must stay unloaded until the add-on is used
+LAZY_MODULES = ("numpy", "mido", "piano_animation.piano_core", "piano_animation.piano_blender")
+
+REGISTER = """
+import json, sys, time
+import fake_bpy
+start = time.perf_counter()
+import piano_animation
+piano_animation.register()
+seconds = time.perf_counter() - start
+piano_animation.unregister()
+piano_animation.register()
+print(json.dumps({
+    "seconds": seconds,
+    "loaded": [name for name in %r if name in sys.modules],
+    "frame_handlers": len(fake_bpy.bpy.app.handlers.frame_change_pre),
+}))
+""" % (LAZY_MODULES,)
+
+REGISTER_WITH_PIPELINE = """
+import json, time
+import fake_bpy
+start = time.perf_counter()
+import piano_animation
+piano_animation.register()
+from piano_animation import piano_core, piano_blender
+try:
+    import mido
+except ImportError:
+    pass
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+
+def run(snippet):
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    registers = [run(REGISTER) for _ in range(runs)]
+    eager = [run(REGISTER_WITH_PIPELINE)["seconds"] for _ in range(runs)]
+
+    register_time = statistics.median(result["seconds"] for result in registers)
+    eager_time = statistics.median(eager)
+    print(f"  register              {register_time * 1000:8.2f} ms  (median of {runs} cold starts)")
+    print(f"  register + pipeline   {eager_time * 1000:8.2f} ms  ({(eager_time - register_time) * 1000:.2f} ms moved to the first run)")
+
+    loaded = sorted({name for result in registers for name in result["loaded"]})
+    handlers = max(result["frame_handlers"] for result in registers)
+    if loaded:
+        print(f"  FAIL: registering loaded {', '.join(loaded)}")
+    if handlers != 1:
+        print(f"  FAIL: {handlers} frame_change_pre handlers after registering twice")
+    return 0 if not loaded and handlers == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
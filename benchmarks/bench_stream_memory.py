@@ -0,0 +1,88 @@
+# Peak memory of the streaming pipeline against parsing the whole file first, at growing file sizes
+#
+#   python benchmarks/bench_stream_memory.py [note_count...]
+#
+# Every path turns a synthetic MIDI file into per-key keyframe timelines, which are dropped as soon as
+# they are made: in Blender they go into F-curves, outside Python's heap. Peak memory is measured with
+# tracemalloc, so it is the Python side only. The mido path is skipped above MIDO_MAX_NOTES, it is slow.
+# Exits with status 1 when the streamed timelines differ from build_key_timelines.
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import fake_bpy  # noqa: F401, puts the repository on sys.path and bpy in sys.modules
+import midi_gen
+from piano_animation import piano_core
+
+MIDO_MAX_NOTES = 100000
+GENERATOR = "chords"
+
+
+def whole_file(parse):
+    def run(path):
+        keyframes = 0
+        for _, frames, _, _ in piano_core.build_key_timelines(parse(path)):
+            keyframes += len(frames)
+        return keyframes
+    return run
+
+
+def streamed(path):
+    keyframes = 0
+    for _, frames, _, _ in piano_core.stream_key_timelines(piano_core.iter_midi_events(path)):
+        keyframes += len(frames)
+    return keyframes
+
+
+def measure(run, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    keyframes = run(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, keyframes
+
+
+def timelines_match(path):
+    expected = {note: (frames, depths) for note, frames, depths, _ in piano_core.build_key_timelines(piano_core.parse_midi_fast(path))}
+    actual = {}
+    for note, frames, depths, _ in piano_core.stream_key_timelines(piano_core.iter_midi_events(path)):
+        old_frames, old_depths = actual.get(note, ((), ()))
+        actual[note] = (np.r_[old_frames, frames], np.r_[old_depths, depths])
+    return actual.keys() == expected.keys() and all(
+        np.array_equal(actual[note][0], frames) and np.array_equal(actual[note][1], depths)
+        for note, (frames, depths) in expected.items())
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    paths = (
+        ("parse_midi (mido)", whole_file(piano_core.parse_midi), MIDO_MAX_NOTES),
+        ("parse_midi_fast", whole_file(piano_core.parse_midi_fast), None),
+        ("streaming", streamed, None),
+    )
+    ok = True
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"{GENERATOR}_{size}.mid")
+            midi_gen.write_smf(path, midi_gen.GENERATORS[GENERATOR](size))
+            print(f"  {size} notes, {os.path.getsize(path) / 1e6:.1f} MB file")
+            for label, run, max_notes in paths:
+                if max_notes is not None and size > max_notes:
+                    continue
+                elapsed, peak, keyframes = measure(run, path)
+                print(f"    {label:<18} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.2f} MB  {keyframes:>9} keyframes")
+            match = timelines_match(path)
+            ok &= match
+            print(f"    streamed timelines {'match' if match else 'MISMATCH'}")
+            os.remove(path)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
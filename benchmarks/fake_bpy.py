@@ -0,0 +1,269 @@
+# Recording stand-in for the parts of bpy the add-ons touch, so their logic can be timed outside Blender
+import importlib
+import os
+import re
+import sys
+import types
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The piano_animation package lives at the top of the repository
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+class Stats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rna_calls = 0  # Python -> RNA round trips (one per bulk call or per-point access)
+        self.values_written = 0  # Floats/ints pushed into keyframe points
+        self.points_added = 0
+
+    def as_dict(self):
+        return {"rna_calls": self.rna_calls, "values_written": self.values_written, "points_added": self.points_added}
+
+
+stats = Stats()
+
+
+class Vector:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+
+class KeyframePoints:
+    def __init__(self):
+        self.co = []
+        self.interpolation = []
+
+    def __len__(self):
+        return len(self.co)
+
+    def add(self, count):
+        stats.rna_calls += 1
+        stats.points_added += count
+        self.co.extend((0.0, 0.0) for _ in range(count))
+        self.interpolation.extend(2 for _ in range(count))  # 'BEZIER'
+
+    def clear(self):
+        stats.rna_calls += 1
+        self.co = []
+        self.interpolation = []
+
+    def foreach_set(self, attr, seq):
+        stats.rna_calls += 1
+        stats.values_written += len(seq)
+        if attr == "co":
+            self.co = [(float(seq[i]), float(seq[i + 1])) for i in range(0, len(seq), 2)]
+        else:
+            setattr(self, attr, [int(value) for value in seq])
+
+    def foreach_get(self, attr, seq):
+        stats.rna_calls += 1
+        if attr == "co":
+            for i, (frame, value) in enumerate(self.co):
+                seq[2 * i] = frame
+                seq[2 * i + 1] = value
+        else:
+            seq[:] = getattr(self, attr)
+
+
+class FCurve:
+    def __init__(self, data_path, index):
+        self.data_path = data_path
+        self.array_index = index
+        self.keyframe_points = KeyframePoints()
+
+    def update(self):
+        stats.rna_calls += 1
+        order = sorted(range(len(self.keyframe_points.co)), key=lambda i: self.keyframe_points.co[i][0])
+        self.keyframe_points.co = [self.keyframe_points.co[i] for i in order]
+        self.keyframe_points.interpolation = [self.keyframe_points.interpolation[i] for i in order]
+
+    def evaluate(self, frame):
+        points = self.keyframe_points.co
+        if not points:
+            return 0.0
+        if frame <= points[0][0]:
+            return points[0][1]
+        for (f0, v0), (f1, v1) in zip(points, points[1:]):
+            if f0 <= frame <= f1:
+                return v0 + (v1 - v0) * (frame - f0) / (f1 - f0)
+        return points[-1][1]
+
+
+class FCurves(list):
+    def find(self, data_path, index=0):
+        stats.rna_calls += 1
+        for fcurve in self:
+            if fcurve.data_path == data_path and fcurve.array_index == index:
+                return fcurve
+        return None
+
+    def new(self, data_path, index=0, action_group=""):
+        stats.rna_calls += 1
+        fcurve = FCurve(data_path, index)
+        self.append(fcurve)
+        return fcurve
+
+
+class Action:
+    def __init__(self, name):
+        self.name = name
+        self.fcurves = FCurves()
+
+
+class AnimData:
+    def __init__(self):
+        self.action = None
+
+
+class ID:
+    # Custom properties, obj["name"]
+    def __init__(self, name):
+        self.name = name
+        self.properties = {}
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+    def __setitem__(self, key, value):
+        self.properties[key] = value
+
+    def __delitem__(self, key):
+        del self.properties[key]
+
+    def __contains__(self, key):
+        return key in self.properties
+
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
+
+
+class Object(ID):
+    def __init__(self, name, location=(0.0, 0.0, 0.0), dimensions=(1.0, 4.5, 1.0)):
+        super().__init__(name)
+        self.location = Vector(*location)
+        self.dimensions = Vector(*dimensions)
+        self.animation_data = None
+
+    def animation_data_create(self):
+        self.animation_data = AnimData()
+        return self.animation_data
+
+    def animation_data_clear(self):
+        self.animation_data = None
+
+
+class Scene(ID):
+    def __init__(self, name, fps=24, fps_base=1.0):
+        super().__init__(name)
+        self.frame_current = 0
+        self.render = types.SimpleNamespace(fps=fps, fps_base=fps_base)
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = IDCollection()
+        self.children = IDCollection()
+
+    @property
+    def all_objects(self):
+        return list(self.objects)
+
+
+class IDCollection(dict):
+    # Iterates over the datablocks like bpy collections do, not over their names
+    def __iter__(self):
+        return iter(list(self.values()))
+
+    def get(self, name, default=None):
+        stats.rna_calls += 1
+        return dict.get(self, name, default)
+
+    def new(self, name, *args, **kwargs):
+        item = self._factory(name, *args, **kwargs)
+        self[name] = item
+        return item
+
+    def remove(self, item):
+        del self[item.name]
+
+
+class _Menu:
+    @staticmethod
+    def append(func):
+        pass
+
+    @staticmethod
+    def remove(func):
+        pass
+
+
+def _prop(**kwargs):
+    return ("Property", kwargs)
+
+
+def _install():
+    bpy = types.ModuleType("bpy")
+    bpy.types = types.SimpleNamespace(
+        PropertyGroup=type("PropertyGroup", (), {}),
+        Operator=type("Operator", (), {}),
+        Panel=type("Panel", (), {}),
+        Scene=type("Scene", (), {}),
+        VIEW3D_MT_object=_Menu,
+    )
+    bpy.props = types.SimpleNamespace(
+        BoolProperty=_prop, StringProperty=_prop, IntProperty=_prop, FloatProperty=_prop,
+        EnumProperty=_prop, PointerProperty=_prop,
+    )
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    bpy.app = types.SimpleNamespace(handlers=types.SimpleNamespace(
+        persistent=lambda handler: handler, frame_change_pre=[], load_post=[], undo_post=[],
+    ))
+    # Paths are never relative to an unsaved file
+    bpy.path = types.SimpleNamespace(abspath=lambda path: path, relpath=lambda path: path,
+                                     clean_name=lambda name: re.sub(r"[^A-Za-z0-9_]", "_", name))
+    bpy.data = types.SimpleNamespace()
+    bpy.context = types.SimpleNamespace()
+    sys.modules["bpy"] = bpy
+
+    # bmesh is only used to build the cube meshes of the generated model
+    bmesh = types.ModuleType("bmesh")
+    bmesh.new = lambda: types.SimpleNamespace(to_mesh=lambda mesh: None, free=lambda: None)
+    bmesh.ops = types.SimpleNamespace(create_cube=lambda bm, size=1.0: None)
+    sys.modules["bmesh"] = bmesh
+    return bpy
+
+
+bpy = _install()
+
+
+def reset_data():
+    # Fresh, empty bpy.data for one benchmark run
+    objects = IDCollection()
+    objects._factory = Object
+    actions = IDCollection()
+    actions._factory = Action
+    collections = IDCollection()
+    collections._factory = Collection
+    bpy.data.objects = objects
+    bpy.data.actions = actions
+    bpy.data.collections = collections
+    bpy.data.filepath = ""
+    bpy.context.scene = Scene("Scene")
+    stats.reset()
+    return bpy.data
+
+
+def add_keyboard(first_note=21, last_note=108):
+    # The generated model's naming, one key object per MIDI pitch
+    for note in range(first_note, last_note + 1):
+        prefix = "BlackKey" if note % 12 in (1, 3, 6, 8, 10) else "WhiteKey"
+        bpy.data.objects[f"{prefix}_{note}"] = Object(f"{prefix}_{note}")
+
+
+def load_addon(name="piano_animation"):
+    return importlib.import_module(name)
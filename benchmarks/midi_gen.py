@@ -0,0 +1,112 @@
+# Synthetic standard MIDI files for the benchmarks, written byte by byte so no MIDI library is needed
+import random
+import struct
+
+TICKS_PER_BEAT = 480
+
+
+def variable_length(value):
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def encode_track(events):
+    # events: (tick, bytes) pairs in any order; note offs are written as note on with velocity 0 via running status
+    data = bytearray()
+    last_tick = 0
+    running_status = None
+    for tick, message in sorted(events, key=lambda event: event[0]):
+        data += variable_length(tick - last_tick)
+        last_tick = tick
+        if message[0] < 0xF0 and message[0] == running_status:
+            data += message[1:]
+        else:
+            data += message
+            running_status = message[0] if message[0] < 0xF0 else None
+    data += b"\x00\xff\x2f\x00"
+    return b"MTrk" + struct.pack(">I", len(data)) + bytes(data)
+
+
+def write_smf(path, tracks, ticks_per_beat=TICKS_PER_BEAT):
+    header = b"MThd" + struct.pack(">IHHH", 6, 1 if len(tracks) > 1 else 0, len(tracks), ticks_per_beat)
+    with open(path, "wb") as midi_file:
+        midi_file.write(header)
+        for events in tracks:
+            midi_file.write(encode_track(events))
+
+
+def note_events(note, start, length, velocity=80, channel=0):
+    return [
+        (start, bytes((0x90 | channel, note, velocity))),
+        (start + length, bytes((0x90 | channel, note, 0))),
+    ]
+
+
+def tempo_event(tick, bpm):
+    tempo = int(60_000_000 / bpm)
+    return (tick, b"\xff\x51\x03" + tempo.to_bytes(3, "big"))
+
+
+def chords(count, seed=0):
+    # Dense four-note chords with some voices held over the next chord
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        chord = i // 4
+        root = 36 + (chord * 5) % 48
+        note = root + (0, 4, 7, 12)[i % 4]
+        events += note_events(note, chord * 120, rng.choice((100, 200, 400)), rng.randint(30, 120))
+    return [events]
+
+
+def trills(count):
+    # Fast alternation between neighbouring keys, the worst case for per-key work
+    events = []
+    for i in range(count):
+        note = 60 + (i % 2) * 2 + ((i // 64) % 12)
+        events += note_events(note, i * 30, 40)
+    return [events]
+
+
+def tempo_changes(count, every=50):
+    # A conductor track with a tempo change every few notes plus one melody track
+    conductor = [tempo_event(i * 60 * every // 4, 60 + (i * 37) % 120) for i in range(count // every + 1)]
+    melody = []
+    for i in range(count):
+        melody += note_events(40 + (i * 7) % 48, i * 60, 50)
+    return [conductor, melody]
+
+
+def multi_track(count, tracks=8):
+    # An orchestral layout, every track on its own channel and register
+    result = []
+    per_track = count // tracks
+    for track in range(tracks):
+        events = [tempo_event(0, 96)] if track == 0 else []
+        for i in range(per_track):
+            note = 24 + track * 8 + (i * 3) % 12
+            events += note_events(note, i * 90 + track * 7, 80 + (i % 3) * 40, 60 + track * 5, track)
+        result.append(events)
+    return result
+
+
+def overlapping(count):
+    # Stacked note ons of the same pitch before any note off, which stresses FIFO pairing
+    events = []
+    for i in range(count):
+        block = i // 16
+        events += note_events(60 + block % 12, block * 2000 + (i % 16) * 10, 1000)
+    return [events]
+
+
+GENERATORS = {
+    "chords": chords,
+    "trills": trills,
+    "tempo_changes": tempo_changes,
+    "multi_track": multi_track,
+    "overlapping": overlapping,
+}
@@ -0,0 +1,113 @@
+# Benchmark suite for the bpy-free core: parse, timeline build, keyframes emitted and peak memory
+#
+#   python benchmarks/run_benchmarks.py [--sizes 1000 10000 100000 1000000] [--json results.json]
+#   python benchmarks/run_benchmarks.py --baseline results.json --tolerance 0.5
+#
+# Every generator in midi_gen is written to a synthetic MIDI file of each size and run through
+# parse_midi_fast and build_key_timelines; animate_keys is then run against the bpy stand-in to count
+# the RNA work it would do in Blender. Peak memory comes from a separate tracemalloc pass so it does
+# not slow down the timed one. With --baseline, exits with status 1 when any metric is worse than the
+# baseline by more than the tolerance.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fake_bpy
+import midi_gen
+from piano_animation import piano_blender, piano_core
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+# Lower is better for all of these; notes is only reported
+COMPARED_METRICS = ("parse_ms", "timeline_ms", "keyframes", "rna_work", "peak_mb")
+
+
+def build_timelines(notes):
+    keyframes = 0
+    for _, frames, _, _ in piano_core.build_key_timelines(notes):
+        keyframes += len(frames)
+    return keyframes
+
+
+def measure(path):
+    start = time.perf_counter()
+    notes = piano_core.parse_midi_fast(path)
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keyframes = build_timelines(notes)
+    timeline_time = time.perf_counter() - start
+
+    fake_bpy.reset_data()
+    fake_bpy.add_keyboard()
+    piano_blender.animate_keys(notes)
+    rna_work = fake_bpy.stats.rna_calls + fake_bpy.stats.values_written
+
+    tracemalloc.start()
+    build_timelines(piano_core.parse_midi_fast(path))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "notes": len(notes),
+        "parse_ms": parse_time * 1000,
+        "timeline_ms": timeline_time * 1000,
+        "keyframes": keyframes,
+        "rna_work": rna_work,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = baseline[name][metric], metrics[metric]
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the piano animation core on synthetic MIDI files.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Note counts to generate")
+    parser.add_argument("--generators", nargs="+", choices=sorted(midi_gen.GENERATORS), default=list(midi_gen.GENERATORS))
+    parser.add_argument("--json", help="Write the results to this path")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown over the baseline")
+    arguments = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in arguments.generators:
+            for size in arguments.sizes:
+                path = os.path.join(directory, f"{name}_{size}.mid")
+                midi_gen.write_smf(path, midi_gen.GENERATORS[name](size))
+                metrics = measure(path)
+                os.remove(path)
+                results[f"{name}/{size}"] = metrics
+                print(f"  {name:<14} {size:>8}  {metrics['notes']:>8} notes  parse {metrics['parse_ms']:9.1f} ms  "
+                      f"timelines {metrics['timeline_ms']:8.1f} ms  {metrics['keyframes']:>9} keyframes  "
+                      f"rna work {metrics['rna_work']:>9}  peak {metrics['peak_mb']:8.2f} MB")
+
+    if arguments.json:
+        with open(arguments.json, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), arguments.tolerance)
+        for regression in regressions:
+            print(f"  REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
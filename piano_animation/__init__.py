@@ -0,0 +1,587 @@
+bl_info = {
+    "name": "Piano Animation",
+    "description": "Animate a generated or an imported piano model from a MIDI file, with MP3 background music",
+    "location": "View3D > Sidebar > Animation",
+    "blender": (4, 0, 0),
+    "category": "Animation",
+}
+
+# One add-on for both a generated piano and an imported model. Registering only loads bpy and the
+# constants module; the pipeline in piano_core and piano_blender, with numpy and mido, is imported the
+# first time an operator runs or a scene with a key state plays.
+
+import bpy
+import os
+import sys
+import re
+import time
+
+from .constants import PAIRING_POLICIES, FRAME_ROUNDING, SPLIT_MODES, PIANO_COLLECTION_NAME, DEFAULT_KEY_NAME_PATTERN, KEY_STATE_PROPERTY
+
+class PianoAnimationPreferences(bpy.types.PropertyGroup):
+    use_imported_model: bpy.props.BoolProperty(
+        name="Use Imported Model",
+        description="Animate an already imported piano model",
+        default=False,
+    )
+    key_collection: bpy.props.StringProperty(
+        name="Key Collection",
+        description="Collection holding the imported key objects, the whole file is searched when it does not exist",
+        default=PIANO_COLLECTION_NAME,
+    )
+    key_name_pattern: bpy.props.StringProperty(
+        name="Key Names",
+        description="Key object names as ';'-separated templates with {note} for the MIDI number, "
+                    "or a regular expression with a (?P<note>...) group",
+        default=DEFAULT_KEY_NAME_PATTERN,
+    )
+    midi_filepath: bpy.props.StringProperty(
+        name="MIDI File Path",
+        description="Path to the MIDI file",
+        subtype="FILE_PATH"
+    )
+    mp3_filepath: bpy.props.StringProperty(
+        name="MP3 File Path",
+        description="Path to the MP3 file to play in the background",
+        subtype="FILE_PATH"
+    )
+    align_music: bpy.props.BoolProperty(
+        name="Align Music",
+        description="Find where the notes start in the MP3 and shift its strip to match, e.g. past lead-in silence",
+        default=True,
+    )
+    split_pianos: bpy.props.EnumProperty(
+        name="Pianos",
+        description="Animate one generated piano per track or channel, for duets and orchestral files",
+        items=SPLIT_MODES,
+        default='NONE',
+    )
+    pairing_policy: bpy.props.EnumProperty(
+        name="Repeated Notes",
+        description="How overlapping notes of the same pitch are paired",
+        items=PAIRING_POLICIES,
+        default='FIFO',
+    )
+    animation_backend: bpy.props.EnumProperty(
+        name="Animate With",
+        description="How the key presses are played back",
+        items=[
+            ('KEYFRAMES', "Keyframes", "Keyframe the height of every key"),
+            ('KEY_STATE', "Frame Handler", "Move the keys on every frame change from a precomputed key state saved next to the "
+                                           ".blend file, without keyframes; bake it to keyframes before rendering elsewhere"),
+        ],
+        default='KEYFRAMES',
+    )
+    frame_rounding: bpy.props.EnumProperty(
+        name="Keyframe Timing",
+        description="How note times are placed on the scene's frames",
+        items=FRAME_ROUNDING,
+        default='NEAREST',
+    )
+    simplify_keyframes: bpy.props.BoolProperty(
+        name="Simplify Keyframes",
+        description="Merge overlapping and back-to-back presses of a key and drop redundant keyframes",
+        default=True,
+    )
+    incremental_update: bpy.props.BoolProperty(
+        name="Incremental Update",
+        description="Only re-key the keys whose notes changed since the last run",
+        default=True,
+    )
+    use_parse_cache: bpy.props.BoolProperty(
+        name="Cache Parsed MIDI",
+        description="Reuse the parsed notes of an unchanged MIDI file from the user cache directory",
+        default=True,
+    )
+    log_timings: bpy.props.BoolProperty(
+        name="Log Timings",
+        description="Report the time spent in each stage and append it as a JSON line to the timing log",
+        default=False,
+    )
+    timing_log_path: bpy.props.StringProperty(
+        name="Timing Log",
+        description="JSON lines file for the stage timings, next to the .blend file when empty",
+        subtype="FILE_PATH",
+    )
+    profile_run: bpy.props.BoolProperty(
+        name="Profile Run",
+        description="Run the animation under cProfile and write the stats next to the .blend file",
+        default=False,
+    )
+
+# The steps before and after keyframing, shared by the blocking and the modal operator
+class PianoAnimationSteps:
+    # For scripts, e.g. bpy.ops.object.piano_animation_operator(filepath="song.mid"), like the old single-mode add-ons took
+    filepath: bpy.props.StringProperty(
+        name="MIDI File",
+        description="MIDI file to animate instead of the one set in the panel",
+        subtype="FILE_PATH",
+        options={'SKIP_SAVE'},
+    )
+
+    def get_midi_filepath(self, preferences):
+        return self.filepath or preferences.midi_filepath
+
+    def check_input_files(self, preferences):
+        midi_filepath = self.get_midi_filepath(preferences)
+        if not midi_filepath or not os.path.isfile(midi_filepath):
+            self.report({'ERROR'}, "MIDI file path is not set or file does not exist.")
+            return False
+        
+        # The music is optional
+        if preferences.mp3_filepath and not os.path.isfile(preferences.mp3_filepath):
+            self.report({'ERROR'}, "MP3 file does not exist.")
+            return False
+
+        # The scene refers to its key state file by a path relative to the .blend file
+        if preferences.animation_backend == 'KEY_STATE' and not bpy.data.filepath:
+            self.report({'ERROR'}, "Save the .blend file before using the frame handler, its key state is stored next to it.")
+            return False
+        # Checked before prepare() builds the pianos and drops the scene's current key state
+        if preferences.animation_backend == 'KEY_STATE' and preferences.split_pianos != 'NONE' and not preferences.use_imported_model:
+            self.report({'ERROR'}, "The frame handler drives one piano, set Pianos to One Piano or animate with keyframes.")
+            return False
+        return True
+
+    # Parse the MIDI file and find the keys, building the model first unless an imported one is used.
+    # Returns all notes and a (notes, key_index) pair per piano, None on errors. When created is a list,
+    # the datablocks of the model that did not exist yet are appended to it.
+    def prepare(self, context, timer, created=None):
+        from . import piano_core, piano_blender
+
+        preferences = context.scene.piano_animation_prefs
+        midi_filepath = self.get_midi_filepath(preferences)
+        split = preferences.split_pianos
+        if split != 'NONE' and preferences.use_imported_model:
+            self.report({'WARNING'}, "Only generated pianos can be split, all notes go to the imported piano.")
+            split = 'NONE'
+
+        try:
+            with timer.stage("parse"):
+                if split != 'NONE':
+                    parts = piano_core.parse_midi_parts(midi_filepath, split, pairing=preferences.pairing_policy)
+                elif preferences.use_parse_cache:
+                    parts = [("", piano_core.parse_midi_cached(midi_filepath, pairing=preferences.pairing_policy))]
+                else:
+                    parts = [("", piano_core.parse_midi_fast(midi_filepath, pairing=preferences.pairing_policy))]
+                notes = piano_core.join_note_tables(parts)
+        except ImportError:
+            # Standard MIDI files are read without mido, only SMPTE timed, format 2 and damaged ones need it
+            self.report({'ERROR'}, "This MIDI file can only be read with the mido module, which is not installed.")
+            return None
+        if not len(notes):
+            self.report({'ERROR'}, "The MIDI file has no notes.")
+            return None
+
+        if preferences.use_imported_model:
+            try:
+                with timer.stage("lookup"):
+                    pianos = [(notes, piano_blender.KeyIndex(preferences.key_collection, preferences.key_name_pattern))]
+            except (re.error, ValueError) as error:
+                self.report({'ERROR'}, f"Key name pattern is not valid: {error}")
+                return None
+        else:
+            pianos = []
+            for index, (_, part_notes) in enumerate(parts):
+                prefix, collection_name, location_y = piano_blender.get_piano_layout(index)
+                with timer.stage("model"):
+                    piano_blender.create_piano_keys_and_base(context, prefix, collection_name, location_y, created)
+                with timer.stage("lookup"):
+                    pianos.append((part_notes, piano_blender.KeyIndex(collection_name, piano_blender.get_key_name_pattern(prefix))))
+
+            # Pianos of an earlier run that split the notes into more parts get no notes, which clears their keys
+            with timer.stage("lookup"):
+                leftover_pianos = piano_blender.get_leftover_pianos(len(parts))
+            if leftover_pianos:
+                self.report({'INFO'}, f"Clearing the keys of {len(leftover_pianos)} pianos left over from an earlier run.")
+            pianos.extend((notes[:0], key_index) for key_index in leftover_pianos)
+
+        # The key depth is measured on a white key, check up front that every piano has one
+        for _, key_index in pianos:
+            try:
+                piano_blender.get_key_depth(key_index)
+            except ValueError as error:
+                self.report({'ERROR'}, str(error))
+                return None
+
+        # Both backends start from a scene without a key state; use_key_state sets a new one
+        piano_blender.clear_key_state(context.scene)
+        return notes, pianos
+
+    # Report the keyframing stats, then add the sound and set the frame range
+    def finish(self, context, notes, stats, timer):
+        from . import piano_core, piano_blender
+
+        preferences = context.scene.piano_animation_prefs
+
+        timer.count(
+            notes=len(notes), keyframes_written=stats["keyframes_written"],
+            keys_touched=stats["keys_rebuilt"] + stats["keys_cleared"], unmapped_notes=stats["unmapped_notes"],
+        )
+        if stats["unmapped_pitches"]:
+            pitches = ", ".join(str(note) for note in stats["unmapped_pitches"])
+            self.report({'WARNING'}, f"No key object for MIDI notes {pitches}, skipped {stats['unmapped_notes']} notes.")
+        if "key_state_frames" in stats:
+            self.report({'INFO'}, f"Keys follow a {stats['key_state_frames']} frame key state in {stats['key_state_path']} "
+                                  f"({stats['keys_cleared']} keys had their keyframes removed).")
+        else:
+            self.report({'INFO'}, f"Re-keyed {stats['keys_rebuilt']} keys ({stats['keys_unchanged']} unchanged, {stats['keys_cleared']} cleared), "
+                                  f"wrote {stats['keyframes_written']} keyframes, simplification saved {stats['keyframes_saved']}.")
+        
+        # Line the MP3 up with the notes
+        frame_start = None
+        if preferences.mp3_filepath and preferences.align_music and len(notes):
+            with timer.stage("align"):
+                try:
+                    frame_start, score = piano_blender.align_background_music(preferences.mp3_filepath, notes, piano_blender.get_scene_fps(context.scene))
+                except OSError as error:
+                    self.report({'WARNING'}, f"Could not align the music: {error}")
+                else:
+                    if score < piano_core.ALIGN_MIN_SCORE:
+                        self.report({'WARNING'}, f"The music does not clearly match the notes (score {score:.1f}), left it where it was.")
+                        frame_start = None
+                    else:
+                        self.report({'INFO'}, f"Music aligned to start at frame {frame_start} (score {score:.1f}).")
+
+        # Add MP3 background music
+        with timer.stage("sound"):
+            if preferences.mp3_filepath:
+                piano_blender.add_background_music(preferences.mp3_filepath, frame_start)
+
+            # Update the end frame based on the last note's end time
+            if len(notes):
+                last_frame = piano_core.get_last_frame(notes, piano_blender.get_scene_fps(context.scene), preferences.frame_rounding)  # The latest end time of any note
+                bpy.context.scene.frame_start = 0
+                bpy.context.scene.frame_end = last_frame # Dynamically set the last frame based on the length of the midi
+
+    def use_key_state(self, context, notes, pianos, timer):
+        from . import piano_blender
+
+        preferences = context.scene.piano_animation_prefs
+        # check_input_files allows one piano only, the others are left over from an earlier run and have no notes
+        key_index = pianos[0][1]
+        with timer.stage("key_state"):
+            stats = piano_blender.use_key_state(context.scene, notes, key_index, simplify=preferences.simplify_keyframes, rounding=preferences.frame_rounding)
+            for piano_notes, leftover_index in pianos[1:]:
+                stats["keys_cleared"] += piano_blender.animate_keys(piano_notes, leftover_index)["keys_cleared"]
+        self.finish(context, notes, stats, timer)
+        return {'FINISHED'}
+
+    def log_timings(self, context, timer):
+        from . import piano_blender
+
+        preferences = context.scene.piano_animation_prefs
+        if not preferences.log_timings:
+            return
+        self.report({'INFO'}, f"Piano animation took {timer.summary()}")
+        log_path = bpy.path.abspath(preferences.timing_log_path) if preferences.timing_log_path else piano_blender.get_output_path(".jsonl")
+        try:
+            timer.append_log(log_path, midi=self.get_midi_filepath(preferences), blend=bpy.data.filepath)
+        except OSError as error:
+            self.report({'WARNING'}, f"Could not write the timing log: {error}")
+
+class PianoAnimationOperator(PianoAnimationSteps, bpy.types.Operator):
+    bl_idname = "object.piano_animation_operator"
+    bl_label = "Create Piano Animation"
+
+    def execute(self, context):
+        preferences = context.scene.piano_animation_prefs
+        if not self.check_input_files(preferences):
+            return {'CANCELLED'}
+
+        # First use loads the pipeline, numpy and all
+        from . import piano_core, piano_blender
+        
+        timer = piano_core.StageTimer()
+        if preferences.profile_run:
+            stats_path = piano_blender.get_output_path(".prof")
+            result = piano_core.run_profiled(stats_path, self.animate, context, timer)
+            self.report({'INFO'}, f"Profile stats written to {stats_path}")
+        else:
+            result = self.animate(context, timer)
+
+        if result == {'FINISHED'}:
+            self.log_timings(context, timer)
+        return result
+
+    # The animation pipeline, one timer stage per step
+    def animate(self, context, timer):
+        from . import piano_blender
+
+        preferences = context.scene.piano_animation_prefs
+
+        prepared = self.prepare(context, timer)
+        if prepared is None:
+            return {'CANCELLED'}
+        notes, pianos = prepared
+        if preferences.animation_backend == 'KEY_STATE':
+            return self.use_key_state(context, notes, pianos, timer)
+            
+        with timer.stage("keyframes"):
+            stats = piano_blender.merge_animation_stats([
+                piano_blender.animate_keys(
+                    piano_notes, key_index, simplify=preferences.simplify_keyframes, incremental=preferences.incremental_update,
+                    fps=piano_blender.get_scene_fps(context.scene), rounding=preferences.frame_rounding,
+                )
+                for piano_notes, key_index in pianos
+            ])
+        self.finish(context, notes, stats, timer)
+        return {'FINISHED'}
+
+# Keyframes the keys a few at a time on a timer so the UI keeps responding; Esc cancels and restores the keys
+class PianoAnimationModalOperator(PianoAnimationSteps, bpy.types.Operator):
+    bl_idname = "object.piano_animation_modal_operator"
+    bl_label = "Create Piano Animation (Interactive)"
+    bl_description = "Animate the keys in steps with a progress bar, press Esc to cancel and undo the run"
+
+    time_budget: bpy.props.FloatProperty(
+        name="Time Budget",
+        description="Seconds of keyframing per timer event",
+        default=0.05,
+        min=0.005,
+        max=1.0,
+    )
+
+    def invoke(self, context, event):
+        preferences = context.scene.piano_animation_prefs
+        if not self.check_input_files(preferences):
+            return {'CANCELLED'}
+
+        from . import piano_core, piano_blender
+
+        self.timer = piano_core.StageTimer()
+        # prepare() clears the key state of the scene and may build the model, Esc undoes both
+        self.key_state = piano_blender.snapshot_key_state(context.scene)
+        self.created = []
+        prepared = self.prepare(context, self.timer, self.created)
+        if prepared is None:
+            return {'CANCELLED'}
+        self.notes, pianos = prepared
+        if preferences.animation_backend == 'KEY_STATE':
+            # Computing a key state takes about as long as parsing, there is nothing to spread out
+            result = self.use_key_state(context, self.notes, pianos, self.timer)
+            if result == {'FINISHED'}:
+                self.log_timings(context, self.timer)
+            return result
+
+        self.stats_list = [{} for _ in pianos]
+        self.snapshots = []  # State of every key before it was changed, restored on cancel
+        self.notes_done = 0
+        self.steps = piano_blender.chain_key_steps([
+            (len(piano_notes), piano_blender.iter_animate_keys(
+                piano_notes, stats, key_index,
+                simplify=preferences.simplify_keyframes, incremental=preferences.incremental_update, snapshots=self.snapshots,
+                fps=piano_blender.get_scene_fps(context.scene), rounding=preferences.frame_rounding,
+            ))
+            for (piano_notes, key_index), stats in zip(pianos, self.stats_list)
+        ])
+
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, max(len(self.notes), 1))
+        self.event_timer = window_manager.event_timer_add(0.01, window=context.window)
+        window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        from . import piano_blender
+
+        if event.type == 'ESC':
+            self.stop(context)
+            restored = self.rollback(context)
+            self.report({'WARNING'}, f"Piano animation cancelled, restored {restored} keys.")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # Animate whole keys until the time budget of this event is used up
+        done = True
+        deadline = time.perf_counter() + self.time_budget
+        try:
+            with self.timer.stage("keyframes"):
+                for self.notes_done in self.steps:
+                    if time.perf_counter() >= deadline:
+                        done = False
+                        break
+        except Exception as error:
+            # E.g. a ReferenceError for a key deleted while the animation ran
+            self.stop(context)
+            self.rollback(context)
+            self.report({'ERROR'}, f"Piano animation failed and was undone: {error}")
+            return {'CANCELLED'}
+        context.window_manager.progress_update(self.notes_done)
+        if not done:
+            return {'RUNNING_MODAL'}
+
+        self.stop(context)
+        self.finish(context, self.notes, piano_blender.merge_animation_stats(self.stats_list), self.timer)
+        self.log_timings(context, self.timer)
+        return {'FINISHED'}
+
+    # Called by Blender when it ends the modal operator itself, e.g. when another file is loaded. The
+    # keys may be gone by then, so only the timer and progress cursor are cleaned up.
+    def cancel(self, context):
+        self.stop(context)
+
+    def stop(self, context):
+        context.window_manager.event_timer_remove(self.event_timer)
+        context.window_manager.progress_end()
+
+    # Put back the keys, the key state and the model as they were before invoke; returns the keys restored
+    def rollback(self, context):
+        from . import piano_blender
+
+        restored = 0
+        for snapshot in reversed(self.snapshots):
+            try:
+                piano_blender.restore_key(snapshot)
+                restored += 1
+            except ReferenceError:
+                pass  # The key was deleted while the animation ran
+        piano_blender.restore_key_state(context.scene, self.key_state)
+        piano_blender.remove_created(self.created)
+        return restored
+
+# Replaces the frame handler of the scene with keyframes, e.g. before sending the file to a render farm
+class PianoAnimationBakeOperator(bpy.types.Operator):
+    bl_idname = "object.piano_animation_bake_operator"
+    bl_label = "Bake Key State to Keyframes"
+    bl_description = "Keyframe the keys from the key state that moves them, and stop moving them on frame change"
+
+    @classmethod
+    def poll(cls, context):
+        return KEY_STATE_PROPERTY in context.scene
+
+    def execute(self, context):
+        from . import piano_blender
+
+        try:
+            keyframes = piano_blender.bake_key_state(context.scene)
+        except (OSError, ValueError) as error:
+            self.report({'ERROR'}, f"Could not load the key state: {error}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Baked the key state into {keyframes} keyframes.")
+        return {'FINISHED'}
+
+# UI Panel
+class PianoAnimationPanel(bpy.types.Panel):
+    bl_label = "Piano Animation"
+    bl_idname = "VIEW3D_PT_piano_animation"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Animation"
+
+    def draw(self, context):
+        layout = self.layout
+        preferences = context.scene.piano_animation_prefs
+
+        # Checkbox to choose between imported or new model
+        layout.prop(preferences, "use_imported_model")
+
+        # Show naming instructions if using imported model
+        if preferences.use_imported_model:
+            layout.label(text="Make sure key names match the pattern below, e.g. 'WhiteKey_21', 'BlackKey_22', 'WhiteKey_23'... starting with 21 for the first white key (A0).", icon='ERROR')
+            layout.prop(preferences, "key_collection")
+            layout.prop(preferences, "key_name_pattern")
+
+        # Input for MIDI file
+        layout.prop(preferences, "midi_filepath", text="MIDI File")
+
+        # Input for MP3 file
+        layout.prop(preferences, "mp3_filepath", text="MP3 File")
+        layout.prop(preferences, "align_music")
+
+        # One generated piano per track or channel
+        if not preferences.use_imported_model:
+            layout.prop(preferences, "split_pianos")
+
+        # Pairing of overlapping notes on the same pitch
+        layout.prop(preferences, "pairing_policy")
+
+        # Keyframes or the keyframe-free frame handler
+        layout.prop(preferences, "animation_backend")
+
+        # Placing notes on frames, at the scene's frame rate
+        layout.prop(preferences, "frame_rounding")
+
+        # Merge overlapping and repeated presses before keyframing
+        layout.prop(preferences, "simplify_keyframes")
+
+        # Only re-key the keys whose notes changed
+        layout.prop(preferences, "incremental_update")
+
+        # Reuse parsed notes of unchanged MIDI files
+        layout.prop(preferences, "use_parse_cache")
+
+        # Opt-in instrumentation
+        layout.prop(preferences, "log_timings")
+        if preferences.log_timings:
+            layout.prop(preferences, "timing_log_path")
+        layout.prop(preferences, "profile_run")
+
+        # Button to trigger the operator
+        layout.operator(PianoAnimationOperator.bl_idname)
+
+        # Same in steps with a progress bar, for large scores
+        layout.operator(PianoAnimationModalOperator.bl_idname)
+
+        # Only available while the keys are moved by the frame handler
+        layout.operator(PianoAnimationBakeOperator.bl_idname)
+
+# Frame handler backend hooks. Scenes without a key state return before the pipeline is imported, so
+# files that never used the backend do not load numpy on frame change.
+@bpy.app.handlers.persistent
+def update_keys_from_state(scene, depsgraph=None):
+    if KEY_STATE_PROPERTY not in scene:
+        return
+    from . import piano_blender
+    piano_blender.update_keys_from_state(scene, depsgraph)
+
+@bpy.app.handlers.persistent
+def reset_key_state_players(*args):
+    piano_blender = sys.modules.get(f"{__name__}.piano_blender")
+    if piano_blender is not None:
+        piano_blender.reset_key_state_players()
+
+KEY_STATE_HANDLERS = (
+    (bpy.app.handlers.frame_change_pre, update_keys_from_state),
+    (bpy.app.handlers.load_post, reset_key_state_players),
+    (bpy.app.handlers.undo_post, reset_key_state_players),
+)
+
+# Menu to add operator
+def menu_func(self, context):
+    self.layout.operator(PianoAnimationOperator.bl_idname)
+
+# Register Function
+def register():
+    bpy.utils.register_class(PianoAnimationPreferences)
+    bpy.utils.register_class(PianoAnimationOperator)
+    bpy.utils.register_class(PianoAnimationModalOperator)
+    bpy.utils.register_class(PianoAnimationBakeOperator)
+    bpy.utils.register_class(PianoAnimationPanel)
+    bpy.types.VIEW3D_MT_object.append(menu_func)
+    
+    # Add the Property Group to the Scene
+    bpy.types.Scene.piano_animation_prefs = bpy.props.PointerProperty(type=PianoAnimationPreferences)
+
+    # Moves the keys of scenes animated with the frame handler backend
+    for handlers, handler in KEY_STATE_HANDLERS:
+        if handler not in handlers:
+            handlers.append(handler)
+
+# Unregister Function
+def unregister():
+    bpy.utils.unregister_class(PianoAnimationPreferences)
+    bpy.utils.unregister_class(PianoAnimationOperator)
+    bpy.utils.unregister_class(PianoAnimationModalOperator)
+    bpy.utils.unregister_class(PianoAnimationBakeOperator)
+    bpy.utils.unregister_class(PianoAnimationPanel)
+    bpy.types.VIEW3D_MT_object.remove(menu_func)
+
+    del bpy.types.Scene.piano_animation_prefs
+
+    for handlers, handler in KEY_STATE_HANDLERS:
+        if handler in handlers:
+            handlers.remove(handler)
+    reset_key_state_players()
@@ -0,0 +1,28 @@
+# Names and choices the add-on's properties and panel need when it registers. Kept free of numpy and of
+# the pipeline modules, which are only imported once the add-on is first used.
+
+# How parse_midi pairs a note off when the same pitch was struck again before it was released
+PAIRING_POLICIES = [
+    ('FIFO', "First In, First Out", "A note off ends the oldest sounding note of that pitch"),
+    ('LIFO', "Last In, First Out", "A note off ends the newest sounding note of that pitch"),
+    ('RETRIGGER', "Retrigger", "Striking a sounding pitch again ends the previous note"),
+]
+# How the notes of a file are split over several keyboards
+SPLIT_MODES = [
+    ('NONE', "One Piano", "Play every track and channel on one keyboard"),
+    ('TRACK', "Per Track", "One keyboard for every track that has notes"),
+    ('CHANNEL', "Per Channel", "One keyboard for every MIDI channel that has notes"),
+]
+# How note times are turned into keyframe positions
+FRAME_ROUNDING = [
+    ('NEAREST', "Nearest Frame", "Put each keyframe on the frame closest to the note time"),
+    ('FLOOR', "Previous Frame", "Put each keyframe on the last frame at or before the note time"),
+    ('SUBFRAME', "Sub-Frame", "Put each keyframe at the exact note time, between frames"),
+]
+
+# Collection the generated piano model is built in
+PIANO_COLLECTION_NAME = "Piano"
+# Key object names of the generated model; ';'-separated templates or one regex with a (?P<note>...) group
+DEFAULT_KEY_NAME_PATTERN = "WhiteKey_{note};BlackKey_{note}"
+# Scene custom property holding the key state file of the frame handler backend
+KEY_STATE_PROPERTY = "piano_animation_key_state"
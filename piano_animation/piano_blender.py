@@ -0,0 +1,658 @@
+# Blender side of the piano animation: maps the timelines from piano_core onto key objects and
+# F-curves, builds the generated piano model and adds the background music. The add-on's operators
+# import it on first use, so numpy is not loaded while Blender starts up.
+
+import math
+import os
+import tempfile
+import uuid
+import bpy
+import bmesh
+import numpy as np
+
+from . import piano_core
+from .constants import PIANO_COLLECTION_NAME, DEFAULT_KEY_NAME_PATTERN, KEY_STATE_PROPERTY
+
+# Distance between the generated pianos of a multi-piano run, along y
+PIANO_SPACING = 8.0
+# Custom properties animate_keys leaves on every key it animated
+FINGERPRINT_PROPERTY = "piano_animation_fingerprint"
+REST_Z_PROPERTY = "piano_animation_rest_z"
+# Scene custom properties of the frame handler backend besides its key state file: how to find and move the keys
+KEY_STATE_DEPTH_PROPERTY = "piano_animation_key_state_depth"
+KEY_STATE_COLLECTION_PROPERTY = "piano_animation_key_state_collection"
+KEY_STATE_PATTERN_PROPERTY = "piano_animation_key_state_pattern"
+KEY_STATE_PROPERTIES = (KEY_STATE_PROPERTY, KEY_STATE_DEPTH_PROPERTY, KEY_STATE_COLLECTION_PROPERTY, KEY_STATE_PATTERN_PROPERTY)
+# The one sound strip add_background_music manages; other strips in the sequencer are left alone
+MUSIC_STRIP_NAME = "BackgroundMusic"
+# Pitch classes (MIDI note % 12) of the white keys, C D E F G A B
+WHITE_KEY_PITCH_CLASSES = (0, 2, 4, 5, 7, 9, 11)
+
+# Maps MIDI pitches to key objects once per run, scoped to one collection, with each key's rest height
+class KeyIndex:
+    def __init__(self, collection_name=PIANO_COLLECTION_NAME, name_pattern=DEFAULT_KEY_NAME_PATTERN):
+        self.collection_name = collection_name
+        self.name_pattern = name_pattern
+        collection = bpy.data.collections.get(collection_name) if collection_name else None
+        objects = sorted(collection.all_objects if collection else bpy.data.objects, key=lambda key_object: key_object.name)
+
+        self.keys = {}
+        for expression in piano_core.compile_key_name_pattern(name_pattern):
+            for key_object in objects:
+                match = expression.fullmatch(key_object.name)
+                if match:
+                    self.keys.setdefault(int(match.group("note")), key_object)
+
+        # The stored rest pose, location.z is already animated on keys keyed by an earlier run
+        self.rest_z = {note: key_object.get(REST_Z_PROPERTY, key_object.location.z) for note, key_object in self.keys.items()}
+
+    def get(self, note):
+        return self.keys.get(note)
+
+# Animate the keys and return keyframe counts; key_depth defaults to 0.8 of the lowest white key's height,
+# simplify merges presses per key before writing, incremental leaves unchanged keys untouched
+def animate_keys(notes, key_index=None, key_depth=None, simplify=True, incremental=True, fps=24, rounding='FLOOR'):
+    stats = {}
+    for _ in iter_animate_keys(notes, stats, key_index, key_depth, simplify, incremental, fps=fps, rounding=rounding):
+        pass
+    return stats
+
+# Same as animate_keys, but returns a generator that animates one key per step and yields the number of
+# notes done so far, so a modal operator can spread the work over timer events. stats is filled in place.
+# When snapshots is a list, the state of every key is appended to it before the key is changed.
+def iter_animate_keys(notes, stats, key_index=None, key_depth=None, simplify=True, incremental=True, snapshots=None,
+                      fps=24, rounding='FLOOR'):
+    if key_index is None:
+        key_index = KeyIndex()
+    key_depth = get_key_depth(key_index, key_depth)
+
+    stats.update(new_animation_stats())
+    return animate_key_steps(notes, stats, key_index, key_depth, simplify, incremental, snapshots, fps, rounding)
+
+# Run the iter_animate_keys steps of several pianos one after the other, from (note_count, steps) pairs,
+# yielding the notes done over all of them
+def chain_key_steps(piano_steps):
+    notes_before = 0
+    for note_count, steps in piano_steps:
+        for notes_done in steps:
+            yield notes_before + notes_done
+        notes_before += note_count
+
+# The counts animate_keys returns, all zero
+def new_animation_stats():
+    return {
+        "keyframes_written": 0, "keyframes_saved": 0,
+        "keys_rebuilt": 0, "keys_unchanged": 0, "keys_cleared": 0,
+        "unmapped_pitches": [], "unmapped_notes": 0,
+    }
+
+# Sum the animate_keys counts of several pianos into one report
+def merge_animation_stats(stats_list):
+    merged = new_animation_stats()
+    for stats in stats_list:
+        for name, value in stats.items():
+            if name == "unmapped_pitches":
+                merged[name] = sorted(set(merged.get(name, [])) | set(value))
+            else:
+                merged[name] = merged.get(name, 0) + value
+    return merged
+
+# How far a key moves down when pressed, 0.8 of the lowest white key's height unless given. That is A0 on
+# a full keyboard; imported models with fewer keys fall back to their lowest mapped white key.
+def get_key_depth(key_index, key_depth=None):
+    if key_depth is not None:
+        return key_depth
+    first_white_key = key_index.get(21)
+    if not first_white_key:
+        white_notes = [note for note in key_index.keys if note % 12 in WHITE_KEY_PITCH_CLASSES]
+        first_white_key = key_index.get(min(white_notes)) if white_notes else None
+    if first_white_key:
+        white_key_height = first_white_key.dimensions.z
+        return 0.8 * white_key_height # Based on white key because black keys are twice the height
+    raise ValueError("No white key found. Ensure that your keys are named correctly.") # Inform user that the naming is incorrect
+
+def animate_key_steps(notes, stats, key_index, key_depth, simplify, incremental, snapshots, fps, rounding):
+    notes_done = 0
+    animated_keys = set()
+    for note, frames, depths, note_count in piano_core.build_key_timelines(notes, fps, simplify=simplify, rounding=rounding):
+        notes_done += note_count
+        key_object = key_index.get(note) # Select piano key based on midi number
+        if not key_object:
+            stats["unmapped_pitches"].append(note)
+            stats["unmapped_notes"] += note_count
+            continue
+        animated_keys.add(key_object.name)
+        # Keyframes on the same frame end up as one point, so the fingerprint and count below match the F-curve
+        frames, depths = piano_core.merge_keyframes(frames, depths)
+        stats["keyframes_saved"] += 4 * note_count - len(frames)
+
+        original_z = key_index.rest_z[note]
+        fingerprint = piano_core.get_keyframes_fingerprint(frames, depths, original_z, key_depth)
+        if incremental and key_object.get(FINGERPRINT_PROPERTY) == fingerprint and count_keyframes(key_object) == len(frames):
+            stats["keys_unchanged"] += 1
+            continue
+
+        if snapshots is not None:
+            snapshots.append(snapshot_key(key_object))
+        write_keyframes(key_object, frames, original_z - depths * key_depth)
+        key_object[REST_Z_PROPERTY] = original_z
+        key_object[FINGERPRINT_PROPERTY] = fingerprint
+        stats["keys_rebuilt"] += 1
+        stats["keyframes_written"] += len(frames)
+        yield notes_done
+
+    # Keys animated by an earlier run that have no notes any more go back to rest
+    for key_object in key_index.keys.values():
+        if FINGERPRINT_PROPERTY in key_object and key_object.name not in animated_keys:
+            if snapshots is not None:
+                snapshots.append(snapshot_key(key_object))
+            clear_keyframes(key_object)
+            stats["keys_cleared"] += 1
+    yield notes_done
+
+# Marks keys written by animate_keys_streaming, which has no fingerprint of a key's whole timeline;
+# the next incremental run sees it does not match and rewrites the key
+STREAMED_FINGERPRINT = "streamed"
+
+# Animate the keys straight from a MIDI file with bounded memory: events are read and paired as they
+# stream in (piano_core.stream_key_timelines) and every key's finished presses are appended to its
+# F-curve batch_notes notes at a time, so no note table or full timeline is held. Always simplifies.
+# Returns the counts of animate_keys plus the number of notes, the end of the last one in seconds and the
+# frame of the last keyframe.
+def animate_keys_streaming(file_path, key_index=None, key_depth=None, fps=24, rounding='FLOOR', pairing='FIFO',
+                           batch_notes=piano_core.STREAM_BATCH_NOTES):
+    if key_index is None:
+        key_index = KeyIndex()
+    key_depth = get_key_depth(key_index, key_depth)
+
+    stats = new_animation_stats()
+    timeline_stats = {}
+    animated_keys = set()
+    events = piano_core.iter_midi_events(file_path)
+    for note, frames, depths, note_count in piano_core.stream_key_timelines(events, fps, rounding, pairing, batch_notes,
+                                                                             stats=timeline_stats):
+        key_object = key_index.get(note)
+        if not key_object:
+            if note not in stats["unmapped_pitches"]:
+                stats["unmapped_pitches"].append(note)
+            stats["unmapped_notes"] += note_count
+            continue
+        frames, depths = piano_core.merge_keyframes(frames, depths)
+        stats["keyframes_saved"] += 4 * note_count - len(frames)
+
+        # The first batch of a key replaces what an earlier run left on it, later ones go after it
+        original_z = key_index.rest_z[note]
+        if key_object.name in animated_keys:
+            append_keyframes(key_object, frames, original_z - depths * key_depth)
+        else:
+            write_keyframes(key_object, frames, original_z - depths * key_depth)
+            key_object[REST_Z_PROPERTY] = original_z
+            key_object[FINGERPRINT_PROPERTY] = STREAMED_FINGERPRINT
+            animated_keys.add(key_object.name)
+            stats["keys_rebuilt"] += 1
+        stats["keyframes_written"] += len(frames)
+    stats["unmapped_pitches"].sort()
+
+    for key_object in key_index.keys.values():
+        if FINGERPRINT_PROPERTY in key_object and key_object.name not in animated_keys:
+            clear_keyframes(key_object)
+            stats["keys_cleared"] += 1
+
+    stats["notes"] = timeline_stats["notes"]
+    stats["last_end"] = timeline_stats["last_end"]
+    stats["last_frame"] = timeline_stats["last_frame"]
+    return stats
+
+# Keyframes, custom properties and height of a key, for restore_key to undo a cancelled run
+def snapshot_key(key_object):
+    co = interpolation = None
+    fcurve = find_location_z_fcurve(key_object)
+    if fcurve is not None:
+        count = len(fcurve.keyframe_points)
+        co = np.empty(2 * count, dtype=np.float32)
+        interpolation = np.empty(count, dtype=np.int32)
+        fcurve.keyframe_points.foreach_get("co", co)
+        fcurve.keyframe_points.foreach_get("interpolation", interpolation)
+    properties = {name: key_object.get(name) for name in (FINGERPRINT_PROPERTY, REST_Z_PROPERTY)}
+    # The animation data and action the key had, so the ones get_location_z_fcurve creates can be removed
+    animation_data = key_object.animation_data
+    action = animation_data.action if animation_data else None
+    return key_object, co, interpolation, properties, key_object.location.z, animation_data is not None, action
+
+def restore_key(snapshot):
+    key_object, co, interpolation, properties, location_z, had_animation_data, action = snapshot
+    if co is None:
+        fcurve = find_location_z_fcurve(key_object)
+        if fcurve is not None:
+            key_object.animation_data.action.fcurves.remove(fcurve)
+    else:
+        fcurve = get_location_z_fcurve(key_object)
+        fcurve.keyframe_points.add(len(interpolation))
+        fcurve.keyframe_points.foreach_set("co", co)
+        fcurve.keyframe_points.foreach_set("interpolation", interpolation)
+        fcurve.update()
+    animation_data = key_object.animation_data
+    if animation_data is not None and animation_data.action is not None and animation_data.action is not action:
+        created_action = animation_data.action
+        animation_data.action = action
+        bpy.data.actions.remove(created_action)
+    if not had_animation_data and key_object.animation_data is not None:
+        key_object.animation_data_clear()
+    for name, value in properties.items():
+        if value is None:
+            if name in key_object:
+                del key_object[name]
+        else:
+            key_object[name] = value
+    key_object.location.z = location_z
+
+# The key's location[2] F-curve, None when it has none
+def find_location_z_fcurve(key_object):
+    if not key_object.animation_data or not key_object.animation_data.action:
+        return None
+    return key_object.animation_data.action.fcurves.find("location", index=2)
+
+# The key's location[2] F-curve without keyframes, created along with its action when missing
+def get_location_z_fcurve(key_object):
+    if key_object.animation_data is None:
+        key_object.animation_data_create()
+    action = key_object.animation_data.action
+    if action is None:
+        action = bpy.data.actions.new(name=f"{key_object.name}Action")
+        key_object.animation_data.action = action
+
+    fcurve = action.fcurves.find("location", index=2)
+    if fcurve is None:
+        fcurve = action.fcurves.new("location", index=2, action_group="Object Transforms")
+    else:
+        fcurve.keyframe_points.clear()
+    return fcurve
+
+# Number of keyframes on the key's location[2] F-curve, 0 when it has none
+def count_keyframes(key_object):
+    fcurve = find_location_z_fcurve(key_object)
+    return len(fcurve.keyframe_points) if fcurve else 0
+
+# Remove the keyframes animate_keys wrote on a key and put it back at rest
+def clear_keyframes(key_object):
+    fcurve = find_location_z_fcurve(key_object)
+    if fcurve is not None:
+        key_object.animation_data.action.fcurves.remove(fcurve)
+    key_object.location.z = key_object.get(REST_Z_PROPERTY, key_object.location.z)
+    del key_object[FINGERPRINT_PROPERTY]
+
+# Keyframe-free backend: the keys are moved by a frame_change_pre handler from a precomputed key state
+# (piano_core.build_key_state) saved next to the .blend file, instead of by 4 or more keyframes per note.
+# Returns the same counts as animate_keys plus the key state's frame count and path.
+def use_key_state(scene, notes, key_index=None, key_depth=None, simplify=True, rounding='FLOOR'):
+    if key_index is None:
+        key_index = KeyIndex()
+    key_depth = get_key_depth(key_index, key_depth)
+
+    stats = new_animation_stats()
+    pitches, note_counts = np.unique(notes["note"][notes["start"] < notes["end"]], return_counts=True)
+    for note, note_count in zip(pitches.tolist(), note_counts.tolist()):
+        if not key_index.get(note) or not piano_core.KEY_STATE_FIRST_NOTE <= note < piano_core.KEY_STATE_FIRST_NOTE + piano_core.KEY_STATE_NOTES:
+            stats["unmapped_pitches"].append(note)
+            stats["unmapped_notes"] += note_count
+
+    # Keyframes of an earlier run would override the handler
+    for note, key_object in key_index.keys.items():
+        if FINGERPRINT_PROPERTY in key_object:
+            clear_keyframes(key_object)
+            stats["keys_cleared"] += 1
+        key_object[REST_Z_PROPERTY] = key_index.rest_z[note]
+
+    state = piano_core.build_key_state(notes, get_scene_fps(scene), simplify=simplify, rounding=rounding)
+    state_path = get_key_state_path(scene)
+    piano_core.save_key_state(state_path, state)
+
+    scene[KEY_STATE_PROPERTY] = bpy.path.relpath(state_path) if bpy.data.filepath else state_path
+    scene[KEY_STATE_DEPTH_PROPERTY] = key_depth
+    scene[KEY_STATE_COLLECTION_PROPERTY] = key_index.collection_name or ""
+    scene[KEY_STATE_PATTERN_PROPERTY] = key_index.name_pattern
+    key_state_players.pop(scene.name, None)
+    update_keys_from_state(scene)
+
+    stats["key_state_frames"] = state.shape[1]
+    stats["key_state_path"] = state_path
+    return stats
+
+# Frames per second of the scene, e.g. 29.97 for 30 fps with an fps_base of 1.001
+def get_scene_fps(scene):
+    return scene.render.fps / scene.render.fps_base
+
+# Stop driving the keys of the scene from its key state and put the keys it drove back at rest, otherwise
+# a key the handler left pressed stays down in a keyframe run that gives it no notes
+def clear_key_state(scene):
+    if KEY_STATE_PROPERTY in scene:
+        key_index = KeyIndex(scene.get(KEY_STATE_COLLECTION_PROPERTY), scene.get(KEY_STATE_PATTERN_PROPERTY, DEFAULT_KEY_NAME_PATTERN))
+        for key_object in key_index.keys.values():
+            if REST_Z_PROPERTY in key_object:
+                key_object.location.z = key_object[REST_Z_PROPERTY]
+    restore_key_state(scene, {})
+
+# The key state properties of the scene, for restore_key_state to bring back when a run is cancelled
+def snapshot_key_state(scene):
+    return {name: scene[name] for name in KEY_STATE_PROPERTIES if name in scene}
+
+def restore_key_state(scene, properties):
+    for name in KEY_STATE_PROPERTIES:
+        if name in properties:
+            scene[name] = properties[name]
+        elif name in scene:
+            del scene[name]
+    # The player is loaded again from the restored properties, and moves the keys back into place
+    key_state_players.pop(scene.name, None)
+    update_keys_from_state(scene)
+
+# Turn the scene's key state into keyframes, for render farms and exports that do not run add-on handlers.
+# Only the frames where a key's motion bends get a keyframe, so playback is unchanged.
+def bake_key_state(scene):
+    player = KeyStatePlayer(scene)
+    keyframes = 0
+    for row, key_object, rest_z in zip(player.rows.tolist(), player.key_objects, player.rest_z.tolist()):
+        depths_row = player.state[row]
+        if not depths_row.any():
+            continue
+        frames, depths = piano_core.get_key_state_keyframes(depths_row)
+        write_keyframes(key_object, frames, rest_z - depths * player.key_depth)
+        key_object[FINGERPRINT_PROPERTY] = piano_core.get_keyframes_fingerprint(frames, depths, rest_z, player.key_depth)
+        keyframes += len(frames)
+    clear_key_state(scene)
+    return keyframes
+
+# Loaded key state of a scene and its key objects, cached per scene by update_keys_from_state
+class KeyStatePlayer:
+    def __init__(self, scene):
+        self.path = scene[KEY_STATE_PROPERTY]
+        self.state = piano_core.load_key_state(bpy.path.abspath(self.path))
+        self.key_depth = scene[KEY_STATE_DEPTH_PROPERTY]
+        key_index = KeyIndex(scene.get(KEY_STATE_COLLECTION_PROPERTY), scene.get(KEY_STATE_PATTERN_PROPERTY, DEFAULT_KEY_NAME_PATTERN))
+
+        notes = [note for note in sorted(key_index.keys)
+                 if piano_core.KEY_STATE_FIRST_NOTE <= note < piano_core.KEY_STATE_FIRST_NOTE + piano_core.KEY_STATE_NOTES]
+        self.rows = np.array(notes, dtype=np.intp) - piano_core.KEY_STATE_FIRST_NOTE
+        self.key_objects = [key_index.get(note) for note in notes]
+        self.rest_z = np.array([key_index.rest_z[note] for note in notes], dtype=np.float64)
+        self.last_z = None
+
+    # Set every key's height for one frame with one lookup into the state, skipping keys that did not move
+    def apply(self, frame):
+        column = self.state[self.rows, min(max(int(frame), 0), self.state.shape[1] - 1)]
+        z = self.rest_z - column * (self.key_depth / piano_core.KEY_STATE_SCALE)
+        changed = range(len(z)) if self.last_z is None else np.flatnonzero(z != self.last_z).tolist()
+        for i in changed:
+            self.key_objects[i].location.z = z[i]
+        self.last_z = z
+        return len(changed)
+
+key_state_players = {}
+
+# Move the keys of a scene with a key state to its current frame; the add-on's frame_change_pre handler
+def update_keys_from_state(scene, depsgraph=None):
+    if KEY_STATE_PROPERTY not in scene:
+        return
+    player = key_state_players.get(scene.name)
+    try:
+        if player is None or player.path != scene[KEY_STATE_PROPERTY]:
+            player = key_state_players[scene.name] = KeyStatePlayer(scene)
+        player.apply(scene.frame_current)
+    except (OSError, ValueError, ReferenceError):
+        # Missing file or keys deleted since the player was built, try again on the next frame
+        key_state_players.pop(scene.name, None)
+
+# Object references and the last heights are stale after undo or loading another file
+def reset_key_state_players(*args):
+    key_state_players.clear()
+
+# Integer value of Keyframe.interpolation 'LINEAR', foreach_set only takes numbers
+LINEAR_INTERPOLATION = 1
+
+# Replace the keyframes of the key's location[2] F-curve with frames/values using bulk foreach_set calls
+def write_keyframes(key_object, frames, values):
+    fcurve = get_location_z_fcurve(key_object)
+
+    frames, values = piano_core.merge_keyframes(frames, values)
+
+    co = np.column_stack((frames, values)).astype(np.float32).ravel()
+    fcurve.keyframe_points.add(len(frames))
+    fcurve.keyframe_points.foreach_set("co", co)
+    fcurve.keyframe_points.foreach_set("interpolation", np.full(len(frames), LINEAR_INTERPOLATION, dtype=np.int32))
+    fcurve.update()
+
+# Add frames/values after the keyframes already on the key's location[2] F-curve. foreach_set has to
+# cover every point, so the old ones are read back and written again along with the new ones.
+def append_keyframes(key_object, frames, values):
+    fcurve = find_location_z_fcurve(key_object)
+    points = fcurve.keyframe_points
+    old_co = np.empty(2 * len(points), dtype=np.float32)
+    points.foreach_get("co", old_co)
+
+    frames, values = piano_core.merge_keyframes(frames, values)
+
+    co = np.concatenate((old_co, np.column_stack((frames, values)).astype(np.float32).ravel()))
+    points.add(len(frames))
+    points.foreach_set("co", co)
+    points.foreach_set("interpolation", np.full(len(co) // 2, LINEAR_INTERPOLATION, dtype=np.int32))
+    fcurve.update()
+
+# Reuse the material from an earlier run instead of making a .001 copy
+def create_material(name, color, created=None):
+    material = bpy.data.materials.get(name)
+    if material is None:
+        material = bpy.data.materials.new(name=name)
+        record_created(created, bpy.data.materials, material)
+    material.diffuse_color = color
+    return material
+
+# Note a datablock a model function made, as (bpy.data collection, datablock), when it keeps a created list
+def record_created(created, id_collection, datablock):
+    if created is not None:
+        created.append((id_collection, datablock))
+
+# Remove the datablocks recorded while the model was built, newest first so objects go before their meshes.
+# Ones the user deleted in the meantime are skipped.
+def remove_created(created):
+    for id_collection, datablock in reversed(created):
+        try:
+            id_collection.remove(datablock)
+        except ReferenceError:
+            pass
+    created.clear()
+
+# Unit cube mesh shared by every object of one kind, e.g. all white keys
+def create_cube_mesh(name, material, created=None):
+    mesh = bpy.data.meshes.get(name)
+    if mesh is None:
+        mesh = bpy.data.meshes.new(name)
+        record_created(created, bpy.data.meshes, mesh)
+        cube = bmesh.new()
+        bmesh.ops.create_cube(cube, size=1.0)
+        cube.to_mesh(mesh)
+        cube.free()
+    if material.name not in mesh.materials:
+        mesh.materials.clear()
+        mesh.materials.append(material)
+    return mesh
+
+# Collection the generated model lives in, created and linked to the scene on first use
+def get_piano_collection(context, collection_name=PIANO_COLLECTION_NAME, created=None):
+    collection = bpy.data.collections.get(collection_name)
+    if collection is None:
+        collection = bpy.data.collections.new(collection_name)
+        record_created(created, bpy.data.collections, collection)
+    if collection.name not in context.scene.collection.children:
+        context.scene.collection.children.link(collection)
+    return collection
+
+# The object an earlier run made in collection, under name or with the .001 suffix Blender gave it
+def get_collection_object(collection, name):
+    piano_object = collection.objects.get(name)
+    if piano_object is not None:
+        return piano_object
+    for candidate in collection.objects:
+        base, _, suffix = candidate.name.rpartition(".")
+        if base == name and suffix.isdigit():
+            return candidate
+    return None
+
+# Create the object directly in bpy.data, or reuse the one made by an earlier run. Only objects already in
+# the piano collection are reused: a same-named object elsewhere (an imported model) is left alone and the
+# new object gets Blender's .001 suffix.
+def create_piano_object(name, mesh, collection, location, scale, created=None):
+    piano_object = get_collection_object(collection, name)
+    if piano_object is None:
+        piano_object = bpy.data.objects.new(name, mesh)
+        record_created(created, bpy.data.objects, piano_object)
+        collection.objects.link(piano_object)
+    else:
+        piano_object.data = mesh
+    piano_object.location = location
+    piano_object.scale = scale
+    return piano_object
+
+# Object name prefix, collection and position of the index-th generated piano of a multi-piano run.
+# The first piano keeps the single-piano names, so files animated before keep working.
+def get_piano_layout(index):
+    if index == 0:
+        return "", PIANO_COLLECTION_NAME, 0.0
+    return f"Piano{index + 1}_", f"{PIANO_COLLECTION_NAME} {index + 1}", -PIANO_SPACING * index
+
+# Key indexes of the generated pianos after the first part_count ones, left behind by an earlier run
+# that split the notes into more parts
+def get_leftover_pianos(part_count):
+    key_indexes = []
+    index = part_count
+    while True:
+        prefix, collection_name, _ = get_piano_layout(index)
+        if bpy.data.collections.get(collection_name) is None:
+            return key_indexes
+        key_index = KeyIndex(collection_name, get_key_name_pattern(prefix))
+        if key_index.keys:
+            key_indexes.append(key_index)
+        index += 1
+
+# Key name pattern of a generated piano whose objects start with prefix
+def get_key_name_pattern(prefix=""):
+    return ";".join(prefix + template for template in DEFAULT_KEY_NAME_PATTERN.split(";"))
+
+# Function to create the piano model if selected; prefix, collection_name and location_y place extra pianos.
+# When created is a list, every datablock made for the model is appended to it, for remove_created.
+def create_piano_keys_and_base(context, prefix="", collection_name=PIANO_COLLECTION_NAME, location_y=0.0, created=None):
+    # Create white material
+    white_material = create_material("WhiteMaterial", (1, 1, 1, 1), created)
+    # Create black material
+    black_material = create_material("BlackMaterial", (0, 0, 0, 1), created)
+    # Create base material
+    base_material = create_material("BaseMaterial", (0.25, 0.1, 0.05, 1), created) 
+
+    # One shared mesh per kind of object instead of a cube operator call per key
+    collection = get_piano_collection(context, collection_name, created)
+    base_mesh = create_cube_mesh("PianoBase", base_material, created)
+    white_key_mesh = create_cube_mesh("PianoWhiteKey", white_material, created)
+    black_key_mesh = create_cube_mesh("PianoBlackKey", black_material, created)
+    
+    # Create base
+    create_piano_object(f"{prefix}PianoBase", base_mesh, collection, (0, location_y, -1), (52, 5, 1), created)
+
+    # Create white keys
+    # (21 = A)
+    white_key_midi_numbers = [21, 23, 24, 26, 27, 29, 31, 33, 34, 36, 37, 39, 41, 43, 44, 46, 47, 49, 51, 53, 54, 56, 57, 59, 61, 63, 64, 66, 67, 69, 71, 73, 74, 76, 77, 79, 81, 83, 84, 86, 88, 90, 91, 93, 95, 97, 98, 100, 102, 104, 105]
+    for i in range(len(white_key_midi_numbers)):
+        create_piano_object(f"{prefix}WhiteKey_{white_key_midi_numbers[i]}", white_key_mesh, collection, (i - 25.5, location_y, 0), (1, 4.5, 1), created)
+
+    #Create black keys    
+    black_key_midi_numbers = [22, 25, 27, 30, 32, 34, 37, 39, 42, 44, 46, 49, 51, 54, 56, 58, 61, 63, 66, 68, 70, 73, 75, 78, 80, 82, 85, 87, 90, 92, 94, 97, 99, 102, 104, 106]
+    black_key_positions = [1, 3, 4, 6, 7]
+    midi_index = 0 
+    for i in range(8):  # Repeat for 7 octaves
+        for pos in black_key_positions:
+            if i == 7 and pos > 1:  # Last octave only has A#
+                break
+            else:
+                if not (pos in [2, 5] and i % 7 == 0):
+                    create_piano_object(f"{prefix}BlackKey_{black_key_midi_numbers[midi_index]}", black_key_mesh, collection, (i * 7 + pos - 25.5, location_y + 1, 0.4), (0.6, 2.5, 1.8), created)
+                    midi_index += 1
+
+# Camera and sun light looking down at the generated piano from the front, so a scene that starts empty
+# (piano_batch.py's workers) can be rendered. The orthographic view is a little wider than the 52 unit base.
+def create_piano_camera_and_light(scene):
+    camera_data = bpy.data.cameras.get("PianoCamera") or bpy.data.cameras.new("PianoCamera")
+    camera_data.type = 'ORTHO'
+    camera_data.ortho_scale = 56
+    camera = bpy.data.objects.get("PianoCamera") or bpy.data.objects.new("PianoCamera", camera_data)
+    camera.location = (0, -30, 25)
+    camera.rotation_euler = (math.atan2(30, 25), 0, 0)  # Aimed at the middle of the keyboard
+
+    light_data = bpy.data.lights.get("PianoLight") or bpy.data.lights.new("PianoLight", type='SUN')
+    light_data.energy = 3.0
+    light = bpy.data.objects.get("PianoLight") or bpy.data.objects.new("PianoLight", light_data)
+    light.location = (0, -10, 20)
+    light.rotation_euler = (math.radians(30), 0, math.radians(20))
+
+    for scene_object in (camera, light):
+        if scene_object.name not in scene.collection.objects:
+            scene.collection.objects.link(scene_object)
+    scene.camera = camera
+    return camera
+
+# Put the MP3 in the managed BackgroundMusic strip, starting at frame_start. Without a frame_start, a strip
+# already playing this file stays where it is, so a hand-nudged offset survives re-running the add-on.
+def add_background_music(mp3_filepath, frame_start=None):
+    scene = bpy.context.scene
+    if scene.sequence_editor is None:
+        scene.sequence_editor_create()
+    sequences = scene.sequence_editor.sequences
+
+    strip = sequences.get(MUSIC_STRIP_NAME)
+    if strip is not None and (strip.type != 'SOUND' or
+                              bpy.path.abspath(strip.sound.filepath) != bpy.path.abspath(mp3_filepath)):
+        sequences.remove(strip)
+        strip = None
+
+    if strip is None:
+        strip = sequences.new_sound(name=MUSIC_STRIP_NAME, filepath=mp3_filepath, channel=1,
+                                    frame_start=0 if frame_start is None else frame_start)
+    elif frame_start is not None:
+        strip.frame_start = frame_start
+    return strip
+
+# Decode an audio file to mono samples at ALIGN_SAMPLE_RATE with Blender's audaspace, returns the samples
+# and their rate. Raises OSError when the file cannot be decoded.
+def decode_audio(filepath, sample_rate=piano_core.ALIGN_SAMPLE_RATE):
+    import aud  # Only in Blender's Python, and only needed once music is aligned
+
+    try:
+        sound = aud.Sound(bpy.path.abspath(filepath)).rechannel(1).resample(sample_rate, False)
+        samples = sound.data()
+    except aud.error as error:
+        raise OSError(f"Could not decode '{filepath}': {error}") from error
+    return np.asarray(samples, dtype=np.float32).reshape(-1), sample_rate
+
+# Scene frame the music strip has to start at to line the audio up with the notes, and the match score
+# (see piano_core.find_audio_offset). Lead-in silence in the recording gives a negative start frame.
+def align_background_music(mp3_filepath, notes, fps=24):
+    samples, sample_rate = decode_audio(mp3_filepath)
+    envelope = piano_core.get_onset_envelope(samples, sample_rate)
+    offset, score = piano_core.find_audio_offset(envelope, piano_core.get_note_onset_train(notes))
+    return -int(round(offset * fps)), score
+
+# Directory of the saved .blend file, or the temp directory while the file is unsaved
+def get_output_dir():
+    if bpy.data.filepath:
+        return os.path.dirname(bpy.path.abspath(bpy.data.filepath))
+    return tempfile.gettempdir()
+
+# Output file named after the .blend file, e.g. song_piano_animation.prof next to song.blend
+def get_output_path(suffix):
+    stem = os.path.splitext(os.path.basename(bpy.data.filepath))[0] if bpy.data.filepath else "untitled"
+    return os.path.join(get_output_dir(), f"{stem}_piano_animation{suffix}")
+
+# Key state file of one scene, e.g. song_piano_animation_Scene.npy next to song.blend. Unsaved sessions get
+# a unique name in the temp directory, so they do not overwrite each other's key state.
+def get_key_state_path(scene):
+    suffix = f"_{bpy.path.clean_name(scene.name)}"
+    if not bpy.data.filepath:
+        suffix += f"_{uuid.uuid4().hex[:8]}"
+    return get_output_path(f"{suffix}.npy")
@@ -0,0 +1,802 @@
+# Blender independent part of the piano animation: MIDI parsing, note pairing, the parse cache,
+# frame conversion and per-key keyframe timelines. Nothing in here imports bpy, so it can be
+# profiled and benchmarked outside Blender; piano_blender.py turns its results into Blender data.
+
+import os
+import sys
+import hashlib
+import heapq
+import mmap
+import re
+import json
+import time
+import zipfile
+import cProfile
+from collections import deque
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+from .constants import PAIRING_POLICIES
+
+# Columnar note table returned by parse_midi, one row per note
+NOTE_DTYPE = np.dtype([
+    ("note", np.uint8),
+    ("start", np.float64),
+    ("end", np.float64),
+    ("velocity", np.uint8),
+    ("channel", np.uint8),
+])
+
+# Bump whenever parse_midi output changes, so cached note tables from older versions are not reused
+PARSER_VERSION = 2
+# Tempo in microseconds per beat until the first set_tempo event (120 BPM), same as mido
+DEFAULT_TEMPO = 500000
+# Note value iter_smf_track uses for tempo changes
+TEMPO_EVENT = -1
+# Notes a key collects in the streaming pipeline before its finished presses are written out
+STREAM_BATCH_NOTES = 1024
+# Cached note tables are evicted least recently used first once the cache grows past this size
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Temporary files of cache writes that were interrupted are removed once they are this many seconds old
+PARSE_CACHE_TEMP_MAX_AGE = 3600
+
+# Frames it takes to press a key down and to release it
+PRESS_DURATION_FRAMES = 1
+RELEASE_DURATION_FRAMES = 1
+
+# Audio alignment: decoded audio is downsampled to ALIGN_SAMPLE_RATE and compared with the notes as
+# onset envelopes of ALIGN_ENVELOPE_RATE values per second, over offsets of up to ALIGN_MAX_OFFSET seconds.
+# A match is trusted when its correlation is ALIGN_MIN_SCORE standard deviations above the best offset more
+# than ALIGN_PEAK_WIDTH seconds away, e.g. one beat off on a steady rhythm.
+ALIGN_SAMPLE_RATE = 8000
+ALIGN_ENVELOPE_RATE = 100
+ALIGN_MAX_OFFSET = 30.0
+ALIGN_MIN_SCORE = 4.5
+ALIGN_PEAK_WIDTH = 0.05
+# Spectrogram frames the onset envelope is computed from at a time
+ALIGN_ENVELOPE_BLOCK = 4096
+
+# Rows of a key state array, one per piano key from A0 (MIDI 21) up, and the value of a fully pressed key
+KEY_STATE_FIRST_NOTE = 21
+KEY_STATE_NOTES = 88
+KEY_STATE_SCALE = 255
+
+# The .001 suffix Blender adds to a name already taken, e.g. by a key of an imported model
+BLENDER_NAME_SUFFIX = r"(?:\.\d+)?"
+
+# Pairs note on/off events into notes, keeping the sounding notes of each pitch in a deque of plain start times
+# With a sink, finished notes are passed to sink(note, start, end, info) instead of being collected.
+class NotePairer:
+    def __init__(self, policy='FIFO', sink=None):
+        if policy not in {name for name, _, _ in PAIRING_POLICIES}:
+            raise ValueError(f"Unknown pairing policy '{policy}'.")
+        self.policy = policy
+        self.sink = sink
+        self.open_starts = [deque() for _ in range(128)]
+        self.open_info = [deque() for _ in range(128)]  # velocity | channel << 8 of each sounding note
+
+        # Finished notes, one list per note table column
+        self.notes = []
+        self.starts = []
+        self.ends = []
+        self.info = []
+
+    def note_on(self, time, note, velocity, channel):
+        if self.policy == 'RETRIGGER':
+            while self.open_starts[note]:
+                self.close(note, self.open_starts[note].popleft(), self.open_info[note].popleft(), time)
+        self.open_starts[note].append(time)
+        self.open_info[note].append(velocity | channel << 8)
+
+    def note_off(self, time, note):
+        starts = self.open_starts[note]
+        if not starts:
+            return
+        if self.policy == 'LIFO':
+            self.close(note, starts.pop(), self.open_info[note].pop(), time)
+        else:
+            self.close(note, starts.popleft(), self.open_info[note].popleft(), time)
+
+    def close(self, note, start, info, end):
+        if self.sink is not None:
+            self.sink(note, start, end, info)
+            return
+        self.notes.append(note)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.info.append(info)
+
+    # Finished notes as a NoteTable; convert maps the stored start/end times, e.g. from ticks to seconds
+    def to_table(self, convert=None):
+        table = np.empty(len(self.notes), dtype=NOTE_DTYPE)
+        starts = np.array(self.starts)
+        ends = np.array(self.ends)
+        info = np.array(self.info, dtype=np.int64)
+        table["note"] = self.notes
+        table["start"] = convert(starts) if convert else starts
+        table["end"] = convert(ends) if convert else ends
+        table["velocity"] = info & 0xFF
+        table["channel"] = info >> 8
+        return table
+
+# Parse midi file into a NoteTable (structured array with NOTE_DTYPE columns)
+def parse_midi(file_path, pairing='FIFO'):
+    import mido  # Only needed for files the fast parser cannot read
+
+    midi = mido.MidiFile(file_path)
+    pairer = NotePairer(pairing)
+    current_time = 0
+
+    for msg in midi:
+        current_time += msg.time
+        if msg.type == 'note_on' and msg.velocity > 0:
+            pairer.note_on(current_time, msg.note, msg.velocity, msg.channel)
+        elif (msg.type == 'note_off') or (msg.type == 'note_on' and msg.velocity == 0):
+            pairer.note_off(current_time, msg.note)
+    return pairer.to_table()
+
+# Read a variable-length quantity, returns the value and the position after it
+def read_variable_length(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+# Read the note and tempo events of one MTrk chunk in the tick domain, without building message objects.
+# Returns the (tick, note, velocity, channel) note events and the (tempo ticks, tempos) of the track.
+def read_smf_track(track):
+    note_events = list(iter_smf_track(track))
+    tempo_ticks, tempos = [], []
+    if any(event[1] == TEMPO_EVENT for event in note_events):
+        tempo_ticks = [event[0] for event in note_events if event[1] == TEMPO_EVENT]
+        tempos = [event[2] for event in note_events if event[1] == TEMPO_EVENT]
+        note_events = [event for event in note_events if event[1] != TEMPO_EVENT]
+    return note_events, (tempo_ticks, tempos)
+
+# Decode one MTrk chunk event by event: yields (tick, note, velocity, channel) for every note event and
+# (tick, TEMPO_EVENT, tempo, 0) for every tempo change, without keeping anything of the track in memory
+def iter_smf_track(track):
+    pos = 0
+    tick = 0
+    status = 0
+    end = len(track)
+
+    while pos < end:
+        delta, pos = read_variable_length(track, pos)
+        tick += delta
+
+        byte = track[pos]
+        if byte >= 0x80:
+            pos += 1
+            if byte != 0xFF:
+                status = byte  # Meta events don't set running status, like in mido
+        elif not status:
+            raise ValueError("Running status without a previous status byte.")
+        else:
+            byte = status
+
+        if byte == 0xFF:
+            meta_type = track[pos]
+            length, pos = read_variable_length(track, pos + 1)
+            if meta_type == 0x51 and length == 3:
+                yield tick, TEMPO_EVENT, (track[pos] << 16) | (track[pos + 1] << 8) | track[pos + 2], 0
+            pos += length
+        elif byte == 0xF0 or byte == 0xF7:
+            length, pos = read_variable_length(track, pos)
+            pos += length
+        else:
+            kind = byte & 0xF0
+            if kind == 0x90 or kind == 0x80:
+                # Note off events are yielded with velocity 0, same as a note on without velocity
+                yield tick, track[pos], track[pos + 1] if kind == 0x90 else 0, byte & 0x0F
+                pos += 2
+            elif kind == 0xC0 or kind == 0xD0:
+                pos += 1
+            else:
+                pos += 2
+
+# Split a standard MIDI file into its MTrk chunks, returns ticks per beat and one memoryview per track
+def read_smf_chunks(data):
+    if bytes(data[:4]) != b"MThd":
+        raise ValueError("Not a standard MIDI file.")
+    header_length = int.from_bytes(data[4:8], "big")
+    midi_format = int.from_bytes(data[8:10], "big")
+    division = int.from_bytes(data[12:14], "big")
+    if midi_format == 2:
+        raise ValueError("Format 2 MIDI files have no shared timeline.")
+    if division & 0x8000:
+        raise ValueError("SMPTE time division is not supported by the fast parser.")
+
+    tracks = []
+    pos = 8 + header_length
+    while pos + 8 <= len(data):
+        chunk_type = bytes(data[pos:pos + 4])
+        length = int.from_bytes(data[pos + 4:pos + 8], "big")
+        if chunk_type == b"MTrk":
+            tracks.append(data[pos + 8:min(pos + 8 + length, len(data))])
+        pos += 8 + length
+    return division, tracks
+
+# Convert ticks to seconds in one go, using binary search in the tempo change table
+def convert_ticks_to_seconds(ticks, tempo_ticks, tempos, ticks_per_beat):
+    seconds_per_tick = tempos * 1e-6 / ticks_per_beat
+    tempo_seconds = np.concatenate(([0.0], np.cumsum(np.diff(tempo_ticks) * seconds_per_tick[:-1])))
+    index = np.searchsorted(tempo_ticks, ticks, side="right") - 1
+    return tempo_seconds[index] + (ticks - tempo_ticks[index]) * seconds_per_tick[index]
+
+# Fast path of parse_midi that reads the file directly through a memoryview and pairs notes in the tick domain
+def parse_midi_fast(file_path, pairing='FIFO'):
+    with open(file_path, "rb") as midi_file:
+        data = memoryview(midi_file.read())
+    note_events = []
+    tempo_ticks, tempos = [0], [DEFAULT_TEMPO]
+    try:
+        ticks_per_beat, tracks = read_smf_chunks(data)
+        for track in tracks:
+            track_notes, track_tempos = read_smf_track(track)
+            note_events += track_notes
+            tempo_ticks += track_tempos[0]
+            tempos += track_tempos[1]
+    except (ValueError, IndexError):
+        # SMPTE timing, format 2 and damaged files go through mido
+        return parse_midi(file_path, pairing)
+
+    # Merge the tracks by tick; the stable sort keeps track order for equal ticks, like mido's merged track
+    note_events.sort(key=itemgetter(0))
+
+    # The last tempo set on a tick wins, starting from mido's default tempo
+    tempo_ticks = np.array(tempo_ticks, dtype=np.int64)
+    tempos = np.array(tempos, dtype=np.int64)
+    tempo_order = np.argsort(tempo_ticks, kind="stable")
+    tempo_ticks, tempos = tempo_ticks[tempo_order], tempos[tempo_order]
+    last_on_tick = np.append(tempo_ticks[1:] != tempo_ticks[:-1], True)
+    tempo_ticks, tempos = tempo_ticks[last_on_tick], tempos[last_on_tick]
+
+    # Pair note on/off events exactly like parse_midi, but on integer ticks
+    pairer = NotePairer(pairing)
+    for tick, note, velocity, channel in note_events:
+        if velocity > 0:
+            pairer.note_on(tick, note, velocity, channel)
+        else:
+            pairer.note_off(tick, note)
+    return pairer.to_table(lambda ticks: convert_ticks_to_seconds(ticks, tempo_ticks, tempos, ticks_per_beat))
+
+# Decode and pair the notes of one MTrk chunk on its own, for parse_midi_parts' worker threads or processes.
+# Returns {channel: (notes, start ticks, end ticks, velocities)} and the track's (tempo ticks, tempos).
+def decode_track(track, pairing='FIFO'):
+    note_events, track_tempos = read_smf_track(track)
+    pairers = {}
+    for tick, note, velocity, channel in note_events:
+        pairer = pairers.get(channel)
+        if pairer is None:
+            pairer = pairers[channel] = NotePairer(pairing)
+        if velocity > 0:
+            pairer.note_on(tick, note, velocity, channel)
+        else:
+            pairer.note_off(tick, note)
+    parts = {
+        channel: (pairer.notes, pairer.starts, pairer.ends, [info & 0xFF for info in pairer.info])
+        for channel, pairer in pairers.items() if pairer.notes
+    }
+    return parts, track_tempos
+
+# Parse a file into one note table per track or channel, as a list of (label, NoteTable) pairs in file
+# order. The tracks are decoded concurrently on executor, a thread pool unless one is passed in; use a
+# ProcessPoolExecutor outside Blender to decode big files on several cores. Notes are paired per track
+# and channel, so a note off only ends a note of its own part.
+def parse_midi_parts(file_path, split='TRACK', pairing='FIFO', executor=None):
+    if split == 'NONE':
+        return [("", parse_midi_fast(file_path, pairing))]
+
+    with open(file_path, "rb") as midi_file:
+        data = midi_file.read()
+    try:
+        ticks_per_beat, tracks = read_smf_chunks(memoryview(data))
+        # Plain bytes, memoryviews cannot be sent to worker processes
+        tracks = [bytes(track) for track in tracks]
+
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=max(1, min(len(tracks), os.cpu_count() or 1))) as pool:
+                decoded = list(pool.map(decode_track, tracks, [pairing] * len(tracks)))
+        else:
+            decoded = list(executor.map(decode_track, tracks, [pairing] * len(tracks)))
+    except (ValueError, IndexError):
+        # Files only mido can read are played on one piano
+        return [("", parse_midi(file_path, pairing))]
+
+    tempo_ticks, tempos = [0], [DEFAULT_TEMPO]
+    for _, (track_tempo_ticks, track_tempos) in decoded:
+        tempo_ticks += track_tempo_ticks
+        tempos += track_tempos
+    tempo_ticks = np.array(tempo_ticks, dtype=np.int64)
+    tempos = np.array(tempos, dtype=np.int64)
+    tempo_order = np.argsort(tempo_ticks, kind="stable")
+    tempo_ticks, tempos = tempo_ticks[tempo_order], tempos[tempo_order]
+    last_on_tick = np.append(tempo_ticks[1:] != tempo_ticks[:-1], True)
+    tempo_ticks, tempos = tempo_ticks[last_on_tick], tempos[last_on_tick]
+
+    # Group the decoded notes by track or by channel
+    groups = {}
+    for track_number, (parts, _) in enumerate(decoded, start=1):
+        for channel, columns in sorted(parts.items()):
+            label = f"Track {track_number}" if split == 'TRACK' else f"Channel {channel + 1}"
+            groups.setdefault(label, []).append((channel, columns))
+
+    tables = []
+    for label, parts in sorted(groups.items(), key=lambda group: int(group[0].split()[1])):
+        table = np.empty(sum(len(columns[0]) for _, columns in parts), dtype=NOTE_DTYPE)
+        pos = 0
+        for channel, (notes, starts, ends, velocities) in parts:
+            count = len(notes)
+            table["note"][pos:pos + count] = notes
+            table["start"][pos:pos + count] = convert_ticks_to_seconds(np.array(starts), tempo_ticks, tempos, ticks_per_beat)
+            table["end"][pos:pos + count] = convert_ticks_to_seconds(np.array(ends), tempo_ticks, tempos, ticks_per_beat)
+            table["velocity"][pos:pos + count] = velocities
+            table["channel"][pos:pos + count] = channel
+            pos += count
+        tables.append((label, table[np.argsort(table["start"], kind="stable")]))
+    return tables
+
+# One note table with the notes of all parts of parse_midi_parts
+def join_note_tables(parts):
+    return np.concatenate([table for _, table in parts]) if parts else np.empty(0, dtype=NOTE_DTYPE)
+
+# Note events of a file read by mido, in the format of iter_midi_events
+def iter_mido_events(file_path):
+    import mido
+
+    current_time = 0
+    for msg in mido.MidiFile(file_path):
+        current_time += msg.time
+        if msg.type == 'note_on':
+            yield current_time, msg.note, msg.velocity, msg.channel
+        elif msg.type == 'note_off':
+            yield current_time, msg.note, 0, msg.channel
+
+# Note events of a whole file merged across tracks in time order, as (seconds, note, velocity, channel)
+# with tempo changes applied. Reads the file through mmap and keeps no events, so memory does not grow
+# with the file length.
+def iter_midi_events(file_path):
+    try:
+        with open(file_path, "rb") as midi_file:
+            data = memoryview(mmap.mmap(midi_file.fileno(), 0, access=mmap.ACCESS_READ))
+        ticks_per_beat, tracks = read_smf_chunks(data)
+        # Walk every track once before the first event is yielded, so a damaged one can still go through mido
+        for track in tracks:
+            deque(iter_smf_track(track), maxlen=0)
+    except (ValueError, IndexError):
+        # SMPTE timing, format 2, empty and damaged files go through mido, which streams its merged track too
+        yield from iter_mido_events(file_path)
+        return
+
+    # heapq.merge keeps track order for equal ticks, like mido's merged track
+    tempo_tick = 0
+    tempo_seconds = 0.0
+    seconds_per_tick = DEFAULT_TEMPO * 1e-6 / ticks_per_beat
+    for tick, note, velocity, channel in heapq.merge(*map(iter_smf_track, tracks), key=itemgetter(0)):
+        seconds = tempo_seconds + (tick - tempo_tick) * seconds_per_tick
+        if note == TEMPO_EVENT:
+            tempo_tick, tempo_seconds = tick, seconds
+            seconds_per_tick = velocity * 1e-6 / ticks_per_beat
+        else:
+            yield seconds, note, velocity, channel
+
+# Streaming counterpart of build_key_timelines on top of iter_midi_events: notes are paired as the events
+# stream in and collected per key, and every batch_notes notes a key's presses that no later note can
+# merge with are simplified and yielded as (note, frames, depths, note_count). A key can get several
+# batches, each one after the frames of the one before. stats, when given, gets the note count, the end
+# time of the last note and the frame of the last keyframe, for get_last_frame's scene end.
+def stream_key_timelines(events, fps=24, rounding='FLOOR', pairing='FIFO', batch_notes=STREAM_BATCH_NOTES,
+                         press_duration_frames=PRESS_DURATION_FRAMES, release_duration_frames=RELEASE_DURATION_FRAMES,
+                         stats=None):
+    buffers = [([], []) for _ in range(128)]  # Start and end times of the unwritten notes of every pitch
+    next_flush = [batch_notes] * 128
+    closed = []
+    note_count = 0
+    last_end = 0.0
+    last_frame = 0
+
+    def collect(note, start, end, info):
+        closed.append(note)
+        if start < end:
+            buffers[note][0].append(start)
+            buffers[note][1].append(end)
+
+    # Split off the presses of a key that end before any press still to come can start
+    def flush(note, boundary):
+        starts = np.array(buffers[note][0])
+        ends = np.array(buffers[note][1])
+        start_frames = convert_time_to_frame(starts, fps, rounding)
+        end_frames = np.maximum(convert_time_to_frame(ends, fps, rounding),
+                                start_frames + press_duration_frames + release_duration_frames + 1)
+        order = np.argsort(start_frames, kind="stable")
+        start_frames, end_frames = start_frames[order], end_frames[order]
+
+        # A clear gap before press k, and no press to come can start before it
+        run_ends = np.maximum.accumulate(end_frames)
+        gaps = np.flatnonzero((start_frames[1:] - 1 > run_ends[:-1]) & (start_frames[1:] <= convert_time_to_frame(boundary, fps, rounding))) + 1
+        if not len(gaps):
+            return None
+        split = gaps[-1]
+        buffers[note] = (starts[order[split:]].tolist(), ends[order[split:]].tolist())
+        frames, depths = simplify_key_presses(start_frames[:split], end_frames[:split], press_duration_frames, release_duration_frames)
+        return note, frames, depths, int(split)
+
+    pairer = NotePairer(pairing, sink=collect)
+    for seconds, note, velocity, channel in events:
+        if velocity > 0:
+            pairer.note_on(seconds, note, velocity, channel)
+        else:
+            pairer.note_off(seconds, note)
+
+        while closed:
+            note = closed.pop()
+            note_count += 1
+            last_end = max(last_end, seconds)
+            if len(buffers[note][0]) < next_flush[note]:
+                continue
+            # Notes still sounding on this pitch started before now and can end up anywhere
+            open_starts = pairer.open_starts[note]
+            batch = flush(note, min(seconds, open_starts[0]) if open_starts else seconds)
+            next_flush[note] = len(buffers[note][0]) + batch_notes
+            if batch is not None:
+                last_frame = max(last_frame, batch[1][-1])
+                yield batch
+
+    for note, (starts, ends) in enumerate(buffers):
+        if starts:
+            start_frames = convert_time_to_frame(np.array(starts), fps, rounding)
+            end_frames = np.maximum(convert_time_to_frame(np.array(ends), fps, rounding),
+                                    start_frames + press_duration_frames + release_duration_frames + 1)
+            frames, depths = simplify_key_presses(start_frames, end_frames, press_duration_frames, release_duration_frames)
+            last_frame = max(last_frame, frames[-1])
+            yield note, frames, depths, len(starts)
+
+    if stats is not None:
+        stats["notes"] = note_count
+        stats["last_end"] = last_end
+        stats["last_frame"] = int(np.ceil(last_frame))
+
+# Directory for cached note tables, following each platform's convention for user caches
+def get_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "piano_animation", "notes")
+
+# Cache key from the file's content, the parser version and pairing policy, so renamed or touched files still hit
+def get_cache_key(file_path, pairing='FIFO'):
+    digest = hashlib.sha256(f"parser-{PARSER_VERSION}:{pairing}:".encode())
+    with open(file_path, "rb") as midi_file:
+        for chunk in iter(lambda: midi_file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Same as parse_midi, but an unchanged file is loaded from the on-disk cache without touching mido
+def parse_midi_cached(file_path, cache_dir=None, pairing='FIFO'):
+    cache_dir = cache_dir or get_cache_dir()
+    cache_path = os.path.join(cache_dir, get_cache_key(file_path, pairing) + ".npz")
+
+    try:
+        with np.load(cache_path) as cached:
+            notes = cached["notes"]
+        os.utime(cache_path)  # Mark as recently used
+        return notes
+    except FileNotFoundError:
+        pass
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        # Truncated or damaged entry, parse again and replace it
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+
+    notes = parse_midi_fast(file_path, pairing)
+
+    # The cache is best effort, a read-only or full disk must not stop the animation
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_path, "wb") as cache_file:
+            np.savez(cache_file, notes=notes)
+        os.replace(temp_path, cache_path)
+        evict_cache(cache_dir)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    return notes
+
+# Remove the least recently used note tables until the cache fits in max_bytes, and the temporary files
+# of writes that never finished; younger ones may still be written by another Blender process
+def evict_cache(cache_dir, max_bytes=PARSE_CACHE_MAX_BYTES):
+    entries = []
+    now = time.time()
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npz"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        elif entry.name.endswith(".tmp") and now - entry.stat().st_mtime > PARSE_CACHE_TEMP_MAX_AGE:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+
+# Seconds to frames in one step over a single time or a whole column of the note table. FLOOR and
+# NEAREST give integer frames, SUBFRAME keeps the exact position between frames as floats.
+def convert_time_to_frame(time, fps=24, rounding='FLOOR'):
+    frames = np.asarray(time, dtype=np.float64) * fps
+    if rounding == 'SUBFRAME':
+        return frames
+    if rounding == 'NEAREST':
+        return np.rint(frames).astype(np.int64)
+    return np.floor(frames).astype(np.int64)
+
+# Scene end frame that covers the release of the last note, with the minimum press length
+# build_key_timelines gives notes too short to animate
+def get_last_frame(notes, fps=24, rounding='FLOOR', press_duration_frames=PRESS_DURATION_FRAMES,
+                   release_duration_frames=RELEASE_DURATION_FRAMES):
+    notes = notes[notes["start"] < notes["end"]]
+    if not len(notes):
+        return 0
+    start_frames = convert_time_to_frame(notes["start"], fps, rounding)
+    end_frames = convert_time_to_frame(notes["end"], fps, rounding)
+    return int(np.ceil(np.maximum(end_frames, start_frames + press_duration_frames + release_duration_frames + 1).max()))
+
+# Onset strength of mono audio samples, ALIGN_ENVELOPE_RATE values per second: the spectral flux, how much
+# the log spectrum rises from one short frame to the next, which peaks where notes are struck. The spectrum
+# is taken ALIGN_ENVELOPE_BLOCK frames at a time in float32, so memory stays flat for long recordings.
+def get_onset_envelope(samples, sample_rate, rate=ALIGN_ENVELOPE_RATE, block_frames=ALIGN_ENVELOPE_BLOCK):
+    hop = max(1, int(round(sample_rate / rate)))
+    window = 2 * hop
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) < window:
+        return np.zeros(0)
+    hann = np.hanning(window).astype(np.float32)
+    frame_count = (len(samples) - window) // hop + 1
+    flux = np.empty(frame_count - 1, dtype=np.float32)
+    previous = None  # Last spectrum of the block before, the first frame of a block rises from it
+    for first in range(0, frame_count, block_frames):
+        last = min(first + block_frames, frame_count)
+        frames = np.lib.stride_tricks.sliding_window_view(samples[first * hop:(last - 1) * hop + window], window)[::hop] * hann
+        spectrum = np.log1p(100 * np.abs(np.fft.rfft(frames, axis=1))).astype(np.float32, copy=False)
+        rise = np.diff(spectrum, axis=0) if previous is None else np.diff(spectrum, axis=0, prepend=previous)
+        flux[max(first - 1, 0):last - 1] = np.maximum(rise, 0).sum(axis=1)
+        previous = spectrum[-1:]
+    # Frame i ends hop samples after the step it is stored at, so an onset shows up as a rise into frame i + 1
+    return np.r_[0.0, 0.0, flux]
+
+# Note onsets as an envelope like get_onset_envelope's: the velocity of every note struck in each step
+def get_note_onset_train(notes, rate=ALIGN_ENVELOPE_RATE):
+    if not len(notes):
+        return np.zeros(0)
+    steps = np.rint(notes["start"] * rate).astype(np.int64)
+    return np.bincount(steps, weights=notes["velocity"] / 127.0)
+
+# Offset in seconds of the audio envelope against the note onset train, positive when the audio starts
+# later than the notes (e.g. lead-in silence), and how many standard deviations the correlation at that
+# offset stands above the best offset more than ALIGN_PEAK_WIDTH away. The cross spectrum is partly
+# whitened first: music on a steady beat grid correlates at every beat, and without whitening those side
+# peaks come out almost as high as the true one, so only loudness and pitch variations tell them apart.
+# The correlation of all lags is computed at once with FFTs, in O(n log n) instead of O(n * lags).
+def find_audio_offset(envelope, onsets, rate=ALIGN_ENVELOPE_RATE, max_offset=ALIGN_MAX_OFFSET):
+    if len(envelope) < 2 or len(onsets) < 2:
+        return 0.0, 0.0
+    envelope = envelope - envelope.mean()
+    onsets = onsets - onsets.mean()
+
+    # Zero-padded to a power of two, so negative lags wrap around to the end without overlapping
+    size = 1 << (len(envelope) + len(onsets) - 1).bit_length()
+    cross_spectrum = np.fft.rfft(envelope, size) * np.conj(np.fft.rfft(onsets, size))
+    weight = np.sqrt(np.abs(cross_spectrum))
+    correlation = np.fft.irfft(cross_spectrum / (weight + 1e-3 * weight.max() + 1e-12), size)
+
+    max_lag = int(max_offset * rate)
+    lags = np.r_[0:min(max_lag, len(envelope) - 1) + 1, -min(max_lag, len(onsets) - 1):0]
+    values = correlation[lags]
+    best = np.argmax(values)
+    others = np.abs(lags - lags[best]) > ALIGN_PEAK_WIDTH * rate
+    spread = values.std()
+    if not others.any() or not spread:
+        return lags[best] / rate, 0.0
+    return lags[best] / rate, float((values[best] - values[others].max()) / spread)
+
+# Keyframe timeline of every key, one (note, frames, depths, note_count) tuple per pitch in ascending order.
+# Depths run from 0 at rest to 1 fully pressed; simplify merges presses per key before keyframing.
+def build_key_timelines(notes, fps=24, press_duration_frames=PRESS_DURATION_FRAMES,
+                        release_duration_frames=RELEASE_DURATION_FRAMES, simplify=True, rounding='FLOOR'):
+    # Only notes with a length can be animated
+    notes = notes[notes["start"] < notes["end"]]
+
+    # Convert time to frame
+    start_frames = convert_time_to_frame(notes["start"], fps, rounding)
+    end_frames = convert_time_to_frame(notes["end"], fps, rounding)
+
+    # Make sure there is enough time for animation
+    end_frames = np.maximum(end_frames, start_frames + press_duration_frames + release_duration_frames + 1)
+
+    # Group the notes by pitch, keeping their order within each key
+    order = np.argsort(notes["note"], kind="stable")
+    pitches, group_starts = np.unique(notes["note"][order], return_index=True)
+
+    for note, group in zip(pitches.tolist(), np.split(order, group_starts[1:])):
+        if simplify:
+            frames, depths = simplify_key_presses(start_frames[group], end_frames[group], press_duration_frames, release_duration_frames)
+        else:
+            # Regular position, pressed, held down and released keyframes of every press on this key
+            frames = np.column_stack((
+                start_frames[group] - 1,
+                start_frames[group] + press_duration_frames,
+                end_frames[group] - release_duration_frames,
+                end_frames[group],
+            )).ravel()
+            depths = np.tile((0.0, 1.0, 1.0, 0.0), len(group))
+        yield note, frames, depths, len(group)
+
+# Sweep the presses of one key and return as few keyframes as keep its motion: sorted frames and
+# press depths (0 at rest, 1 fully pressed). Overlapping presses are merged into one, and a key
+# pressed again right after its release bounces up in between instead of getting rest keyframes
+# on top of the release, or stays down when there is no frame to bounce in.
+def simplify_key_presses(start_frames, end_frames, press_duration_frames, release_duration_frames):
+    order = np.argsort(start_frames, kind="stable")
+    starts, ends = start_frames[order], end_frames[order]
+
+    # Merge presses that start before an earlier press on this key is released
+    run_ends = np.maximum.accumulate(ends)
+    first = np.flatnonzero(np.r_[True, starts[1:] > run_ends[:-1]])
+    starts, ends = starts[first], np.maximum.reduceat(ends, first)
+
+    # Back-to-back presses, whose rest keyframe would not come after the previous release,
+    # are held through when there are not two frames between release and press to bounce in
+    back_to_back = starts[1:] - 1 <= ends[:-1]
+    room = (starts[1:] + press_duration_frames) - (ends[:-1] - release_duration_frames) >= 2
+    first = np.flatnonzero(np.r_[True, ~(back_to_back & ~room)])
+    starts, ends = starts[first], np.maximum.reduceat(ends, first)
+    bounce = starts[1:] - 1 <= ends[:-1]
+
+    frames = np.column_stack((
+        starts - 1,
+        starts + press_duration_frames,
+        ends - release_duration_frames,
+        ends,
+    ))
+    depths = np.tile((0.0, 1.0, 1.0, 0.0), (len(starts), 1))
+    keep = np.ones(frames.shape, dtype=bool)
+    keep[1:, 0] = ~bounce
+    keep[:-1, 3] = ~bounce
+    keep[:, 2] = frames[:, 2] > frames[:, 1]  # The hold keyframe is redundant when it falls on the press
+
+    # One rest keyframe halfway between the release and the next press of a bounce
+    bounce_frames = ((ends[:-1] - release_duration_frames) + (starts[1:] + press_duration_frames))[bounce]
+    bounce_frames = bounce_frames // 2 if bounce_frames.dtype.kind in "iu" else bounce_frames / 2
+
+    frames = np.concatenate((frames[keep], bounce_frames))
+    depths = np.concatenate((depths[keep], np.zeros(len(bounce_frames))))
+    order = np.argsort(frames, kind="stable")
+    return frames[order], depths[order]
+
+# Sort keyframes by frame; of several keyframes on one frame the last one wins, like keyframe_insert
+def merge_keyframes(frames, values):
+    frames, last = np.unique(frames[::-1], return_index=True)
+    return frames, values[::-1][last]
+
+# Per-frame press depth of all 88 keys as a (KEY_STATE_NOTES, frame_count) uint8 array, row 0 is A0.
+# Depths are scaled to 0..KEY_STATE_SCALE; frames before the first keyframe of a key are at rest.
+def build_key_state(notes, fps=24, simplify=True, rounding='FLOOR'):
+    timelines = [
+        (note, *merge_keyframes(frames, depths))
+        for note, frames, depths, _ in build_key_timelines(notes, fps, simplify=simplify, rounding=rounding)
+        if KEY_STATE_FIRST_NOTE <= note < KEY_STATE_FIRST_NOTE + KEY_STATE_NOTES
+    ]
+    frame_count = max((int(np.ceil(frames[-1])) + 1 for _, frames, _ in timelines), default=1)
+
+    state = np.zeros((KEY_STATE_NOTES, frame_count), dtype=np.uint8)
+    all_frames = np.arange(frame_count)
+    for note, frames, depths in timelines:
+        state[note - KEY_STATE_FIRST_NOTE] = np.rint(np.interp(all_frames, frames, depths) * KEY_STATE_SCALE)
+    return state
+
+# The fewest keyframes that reproduce one row of a key state with linear interpolation: the first and
+# last frame plus every frame where the slope changes. Returns frames and depths from 0 to 1.
+def get_key_state_keyframes(row):
+    row = row.astype(np.int16)
+    if len(row) < 3:
+        frames = np.arange(len(row))
+    else:
+        bends = np.flatnonzero(np.diff(row, 2)) + 1
+        frames = np.concatenate(([0], bends, [len(row) - 1]))
+    return frames, row[frames] / KEY_STATE_SCALE
+
+# Key states are plain .npy files so they can be memory-mapped instead of read into memory
+def save_key_state(path, state):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as state_file:
+        np.save(state_file, state)
+    os.replace(temp_path, path)
+
+def load_key_state(path):
+    state = np.load(path, mmap_mode="r")
+    if state.ndim != 2 or state.shape[0] != KEY_STATE_NOTES or state.dtype != np.uint8:
+        raise ValueError(f"'{path}' is not a piano key state.")
+    return state
+
+# Identifies the keyframes of one key, so unchanged keys can be skipped on the next run
+def get_keyframes_fingerprint(frames, depths, rest_z, key_depth):
+    digest = hashlib.sha1(np.asarray(frames, dtype=np.float64).tobytes())
+    digest.update(np.asarray(depths, dtype=np.float64).tobytes())
+    digest.update(np.array((rest_z, key_depth), dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+# Compile a key name pattern into regular expressions, in order of priority. Templates also match the
+# key names with a Blender suffix; a regular expression is used as written.
+def compile_key_name_pattern(pattern):
+    if "(?P<note>" in pattern:
+        return [re.compile(pattern)]
+    expressions = []
+    for template in pattern.split(";"):
+        template = template.strip()
+        if "{note}" not in template:
+            raise ValueError(f"Key name template '{template}' has no {{note}} placeholder.")
+        expressions.append(re.compile(re.escape(template).replace(re.escape("{note}"), r"(?P<note>\d+)") + BLENDER_NAME_SUFFIX))
+    return expressions
+
+# Wall time of each stage of a run plus counters (notes, keyframes written, ...), for reports and the timing log
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, **counters):
+        self.counters.update(counters)
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def summary(self):
+        stages = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.stages.items())
+        counters = ", ".join(f"{name.replace('_', ' ')} {value}" for name, value in self.counters.items())
+        return f"{self.total() * 1000:.0f} ms ({stages}); {counters}"
+
+    def to_record(self, **fields):
+        return {"time": time.time(), **fields, "total": self.total(), "stages": self.stages, "counters": self.counters}
+
+    # One JSON object per line, so runs can be appended and read back without parsing the whole file
+    def append_log(self, log_path, **fields):
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        with open(log_path, "a") as log_file:
+            log_file.write(json.dumps(self.to_record(**fields)) + "\n")
+
+# Call function under cProfile and dump the stats to stats_path, also when it raises
+def run_profiled(stats_path, function, *args, **kwargs):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(stats_path)
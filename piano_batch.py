@@ -0,0 +1,237 @@
+# Headless batch mode: animates a list or directory of MIDI files, one background Blender process per file
+#
+# Run from a shell with any Python (or inside Blender), pointing at the Blender binary:
+#   python piano_batch.py --blender /path/to/blender --jobs 8 --output renders/ songs/
+#   blender -b --python piano_batch.py -- --jobs 8 --output renders/ songs/ extra.mid
+#
+# Every MIDI file is paired with the MP3 of the same name next to it (or in --audio-dir) when there is
+# one, and gets a <name>.blend in the output directory (and a rendered animation with --render).
+# A per-file timing and error summary is printed at the end and can be written as JSON with --summary.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+MIDI_EXTENSIONS = (".mid", ".midi")
+# Worker processes print their result on a line starting with this marker
+RESULT_MARKER = "PIANO_BATCH_RESULT "
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+def get_script_arguments():
+    # Blender passes the script's own arguments after "--"
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return [] if bpy else sys.argv[1:]
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(prog="piano_batch.py", description="Animate a batch of MIDI files in background Blender processes.")
+    parser.add_argument("inputs", nargs="*", help="MIDI files or directories containing MIDI files")
+    parser.add_argument("--output", default="piano_batch_output", help="Directory for the .blend files and renders")
+    parser.add_argument("--audio-dir", help="Directory to look for the MP3 files in, instead of next to each MIDI file")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER"), help="Blender binary, defaults to $BLENDER or the running Blender")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of Blender processes to run at once")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds before a job is stopped")
+    parser.add_argument("--render", action="store_true", help="Also render the animation of every file")
+    parser.add_argument("--stream", action="store_true", help="Stream each file into keyframes with bounded memory, for very long files")
+    parser.add_argument("--no-align", dest="align", action="store_false",
+                        help="Start the music at frame 0 instead of lining it up with the notes (never aligned with --stream)")
+    parser.add_argument("--summary", help="Write the per-file summary as JSON to this path")
+
+    # Used by the dispatcher to run a single job inside a Blender process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--midi", help=argparse.SUPPRESS)
+    parser.add_argument("--mp3", help=argparse.SUPPRESS)
+    parser.add_argument("--blend", help=argparse.SUPPRESS)
+    return parser.parse_args(arguments)
+
+# Collect (midi, mp3 or None) pairs from files and directories, in a stable order
+def find_jobs(inputs, audio_dir=None):
+    midi_paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(MIDI_EXTENSIONS):
+                    midi_paths.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            midi_paths.append(path)
+        else:
+            raise FileNotFoundError(f"Input '{path}' does not exist.")
+
+    jobs = []
+    for midi_path in midi_paths:
+        stem = os.path.splitext(os.path.basename(midi_path))[0]
+        mp3_path = os.path.join(audio_dir or os.path.dirname(midi_path), stem + ".mp3")
+        jobs.append((os.path.abspath(midi_path), os.path.abspath(mp3_path) if os.path.isfile(mp3_path) else None))
+    return jobs
+
+def run_job(blender, midi_path, mp3_path, output_dir, render, timeout, stream=False, align=True):
+    stem = os.path.splitext(os.path.basename(midi_path))[0]
+    blend_path = os.path.join(os.path.abspath(output_dir), stem + ".blend")
+    command = [
+        blender, "--background", "--factory-startup", "--python", os.path.abspath(__file__), "--",
+        "--worker", "--midi", midi_path, "--blend", blend_path,
+    ]
+    if mp3_path:
+        command += ["--mp3", mp3_path]
+    if render:
+        command.append("--render")
+    if stream:
+        command.append("--stream")
+    if not align:
+        command.append("--no-align")
+
+    result = {"midi": midi_path, "mp3": mp3_path, "blend": blend_path, "ok": False}
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        result["error"] = f"Timed out after {timeout} seconds."
+    except OSError as error:
+        result["error"] = f"Could not start Blender: {error}"
+    else:
+        for line in process.stdout.splitlines():
+            if line.startswith(RESULT_MARKER):
+                result.update(json.loads(line[len(RESULT_MARKER):]))
+        if "error" not in result and not result["ok"]:
+            # Blender crashed or the script failed before reporting
+            output = (process.stderr or process.stdout).strip().splitlines()
+            result["error"] = output[-1] if output else f"Blender exited with status {process.returncode}."
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def print_summary(results, seconds):
+    width = max([len(os.path.basename(result["midi"])) for result in results] + [4])
+    for result in results:
+        name = os.path.basename(result["midi"])
+        if result["ok"]:
+            print(f"{name:<{width}}  {result['seconds']:8.2f} s  {result['notes']:>8} notes  {result['keyframes']:>9} keyframes")
+        else:
+            print(f"{name:<{width}}  {result['seconds']:8.2f} s  FAILED: {result.get('error')}")
+    failed = sum(not result["ok"] for result in results)
+    print(f"{len(results) - failed}/{len(results)} files animated in {seconds:.2f} s, {failed} failed.")
+
+def dispatch(arguments):
+    blender = arguments.blender or (bpy.app.binary_path if bpy else None)
+    if not blender:
+        print("No Blender binary, pass --blender or set $BLENDER.", file=sys.stderr)
+        return 2
+
+    jobs = find_jobs(arguments.inputs, arguments.audio_dir)
+    if not jobs:
+        print("No MIDI files found.", file=sys.stderr)
+        return 2
+    os.makedirs(arguments.output, exist_ok=True)
+
+    # Each job is its own Blender process; the threads only wait on them
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, arguments.jobs)) as pool:
+        futures = [
+            pool.submit(run_job, blender, midi_path, mp3_path, arguments.output, arguments.render, arguments.timeout,
+                        arguments.stream, arguments.align)
+            for midi_path, mp3_path in jobs
+        ]
+        results = [future.result() for future in futures]
+    seconds = time.perf_counter() - start
+
+    print_summary(results, seconds)
+    if arguments.summary:
+        with open(arguments.summary, "w") as summary_file:
+            json.dump({"seconds": seconds, "jobs": results}, summary_file, indent=2)
+    return 0 if all(result["ok"] for result in results) else 1
+
+# Runs inside the background Blender process: the same pipeline as PianoAnimationOperator.execute
+def run_worker(arguments):
+    sys.path.insert(0, ADDON_DIR)
+    from piano_animation import piano_core, piano_blender
+
+    result = {"ok": False}
+    timer = piano_core.StageTimer()
+
+    try:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        scene = bpy.context.scene
+
+        fps = piano_blender.get_scene_fps(scene)
+
+        notes = None
+        if not arguments.stream:
+            with timer.stage("parse"):
+                notes = piano_core.parse_midi_cached(arguments.midi)
+
+        with timer.stage("model"):
+            piano_blender.create_piano_keys_and_base(bpy.context)
+            # The factory settings are empty, a render needs a camera and a light
+            piano_blender.create_piano_camera_and_light(scene)
+
+        with timer.stage("lookup"):
+            key_index = piano_blender.KeyIndex()
+
+        with timer.stage("keyframes"):
+            if arguments.stream:
+                # Parsing happens while the keyframes are written
+                stats = piano_blender.animate_keys_streaming(arguments.midi, key_index, fps=fps, rounding='NEAREST')
+                note_count = stats["notes"]
+                last_frame = stats["last_frame"]
+            else:
+                stats = piano_blender.animate_keys(notes, key_index, fps=fps, rounding='NEAREST')
+                note_count = len(notes)
+                last_frame = piano_core.get_last_frame(notes, fps, 'NEAREST')
+
+        frame_start = None
+        if arguments.mp3 and arguments.align and notes is not None and len(notes):
+            with timer.stage("align"):
+                try:
+                    frame_start, score = piano_blender.align_background_music(arguments.mp3, notes, fps)
+                except OSError as error:
+                    result["music_error"] = str(error)
+                else:
+                    result["music_score"] = score
+                    if score < piano_core.ALIGN_MIN_SCORE:
+                        frame_start = None  # No clear match, the music starts at frame 0
+                    result["music_frame_start"] = frame_start
+
+        with timer.stage("sound"):
+            if arguments.mp3:
+                piano_blender.add_background_music(arguments.mp3, frame_start)
+            if note_count:
+                scene.frame_start = 0
+                scene.frame_end = last_frame
+
+        with timer.stage("save"):
+            bpy.ops.wm.save_as_mainfile(filepath=arguments.blend)
+
+        if arguments.render:
+            with timer.stage("render"):
+                scene.render.filepath = os.path.splitext(arguments.blend)[0] + "_"
+                bpy.ops.render.render(animation=True)
+
+        result.update(ok=True, notes=note_count, keyframes=stats["keyframes_written"], unmapped_notes=stats["unmapped_notes"])
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["stages"] = timer.stages
+
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+    return 0 if result["ok"] else 1
+
+def main():
+    arguments = parse_arguments(get_script_arguments())
+    if arguments.worker:
+        if bpy is None:
+            print("--worker has to run inside Blender.", file=sys.stderr)
+            return 2
+        return run_worker(arguments)
+    return dispatch(arguments)
+
+if __name__ == "__main__":
+    status = main()
+    # Blender ignores the script's exit status unless the process is ended here
+    sys.exit(status)